@@ -4,248 +4,291 @@
 # COM CORREÇÕES DO YOUTUBE JÁ APLICADAS
 
 import sys
+import logging
+import sqlite3
 import cv2
 import numpy as np
-import yt_dlp
 import os
 import time
+import threading
 from pathlib import Path
-from ultralytics import YOLO
 from PySide6.QtCore import QObject, QThread, Signal, Slot, Qt
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QRadioButton, QLineEdit, QSlider,
+    QLabel, QPushButton, QRadioButton, QLineEdit, QSlider, QCheckBox, QSpinBox, QComboBox,
+    QDoubleSpinBox,
     QFileDialog, QGroupBox, QMessageBox, QSizePolicy, QFrame, QTabWidget
 )
 from PySide6.QtGui import QImage, QPixmap, QColor, QPalette
 import pyqtgraph as pg
 
-# ========== CONFIGURAÇÕES ==========
-VEHICLE_CLASSES = {
-    2: 'Carro',
-    3: 'Moto',
-    5: 'Ônibus',
-    7: 'Caminhão'
-}
+from checkpoint import checkpoint_path, remove_checkpoint
+from pipeline import INFERENCE_BACKENDS, VehiclePipeline
+from profiling import STAGES
+from region import format_points, load_region_config, parse_points, save_region_config
+from store import EventStore
 
-SIMPLE_VEHICLE_MAP = {
-    2: 'Carro',
-    3: 'Moto',
-    5: 'Caminhão',
-    7: 'Caminhão'
-}
+logger = logging.getLogger(__name__)
 
+# ========== CONFIGURAÇÕES ==========
 VEHICLE_COLORS = {
     'Carro': '#4CAF50',
     'Moto': '#F44336',
     'Caminhão': '#FF9800'
 }
 
-# ========== CONTADOR POR ID ÚNICO ==========
-class UniqueVehicleCounter:
-    def __init__(self):
-        self.seen_ids = set()
-        self.timeline = []
-        self.class_counts = {'Carro': 0, 'Moto': 0, 'Caminhão': 0}
-        self.class_timeline = {'Carro': [], 'Moto': [], 'Caminhão': []}
-
-    def add_new_ids(self, current_ids, class_info=None):
-        new_ids = [vid for vid in current_ids if vid not in self.seen_ids]
-
-        for vid in new_ids:
-            self.seen_ids.add(vid)
-            if class_info and vid in class_info:
-                vehicle_type = class_info[vid]
-                if vehicle_type in self.class_counts:
-                    self.class_counts[vehicle_type] += 1
-
-        if new_ids:
-            current_time = time.time()
-            self.timeline.append((current_time, len(new_ids)))
-
-            for vehicle_type in self.class_counts:
-                count = sum(1 for vid in new_ids if class_info and class_info.get(vid) == vehicle_type)
-                if count > 0:
-                    self.class_timeline[vehicle_type].append((current_time, count))
-
-        return len(new_ids), len(self.seen_ids)
-
-    def get_cumulative_data(self):
-        if not self.timeline:
-            return [], []
-        start_time = self.timeline[0][0]
-        times = [t - start_time for t, c in self.timeline]
-        counts = np.cumsum([c for t, c in self.timeline])
-        return times, counts
-
-    def get_class_cumulative_data(self, vehicle_type):
-        if vehicle_type not in self.class_timeline or not self.class_timeline[vehicle_type]:
-            return [], []
-        start_time = self.timeline[0][0] if self.timeline else 0
-        timeline = self.class_timeline[vehicle_type]
-        times = [t - start_time for t, c in timeline]
-        counts = np.cumsum([c for t, c in timeline])
-        return times, counts
-
-# ========== FUNÇÕES AUXILIARES ==========
-def load_model():
-    import sys
-    from pathlib import Path
-    
-    # Detecta se está rodando como .exe ou .py
-    if getattr(sys, 'frozen', False):
-        # Rodando como .exe - PyInstaller extrai aqui
-        base_path = sys._MEIPASS
-    else:
-        # Rodando como .py normal
-        base_path = Path(__file__).parent
-    
-    model_path = Path(base_path) / "yolov8n.pt"
-    return YOLO(str(model_path))
-
-def get_youtube_stream_url(url):
-    """Obtém URL de stream direto do YouTube - CORRIGIDO"""
-    ydl_opts = {
-        'format': 'best[height<=720]/best',
-        'quiet': True,
-        'no_warnings': True,
-        'nocheckcertificate': True,
-        'geo_bypass': True,
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-    }
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            if 'url' in info:
-                return info['url']
-            elif 'manifest_url' in info:
-                return info['manifest_url']
-            elif 'formats' in info and len(info['formats']) > 0:
-                return info['formats'][0]['url']
-            else:
-                print("Erro: Nenhuma URL de stream encontrada")
-                return None
-    except Exception as e:
-        print(f"Erro ao obter stream: {e}")
-        return None
+# Pontos mantidos por curva no gráfico acumulado
+GRAPH_CAPACITY = 20000
 
 # ========== WORKER DE VÍDEO ==========
-class VideoWorker(QObject):
-    frame_ready = Signal(np.ndarray)
-    stats_updated = Signal(int, int)
-    graph_data_ready = Signal(object, object, dict)
-    processing_finished = Signal()
-    error_occurred = Signal(str)
-    vehicle_distribution = Signal(dict)
-    fps_updated = Signal(float)
-
-    def __init__(self, video_path, source_type, youtube_url, frame_skip):
-        super().__init__()
-        self.video_path_input = video_path
-        self.source_type = source_type
-        self.youtube_url = youtube_url
-        self.frame_skip = frame_skip
-        self._is_running = True
-
-    @Slot()
-    def run(self):
-        try:
-            video_path = self.video_path_input
-
-            if self.source_type == "YouTube" and self.youtube_url:
-                stream_url = get_youtube_stream_url(self.youtube_url)
-                if not stream_url:
-                    raise ValueError("Não foi possível obter stream do YouTube")
-                video_path = stream_url
+class LatestValueSlot:
+    """Guarda apenas o valor mais recente entre a thread do worker e a GUI.
 
-            if not video_path:
-                raise ValueError("Caminho de vídeo inválido")
+    put() retorna o valor pendente que foi substituído; None significa que o
+    slot estava vazio e a GUI precisa ser avisada.
+    """
 
-            model = load_model()
-            cap = cv2.VideoCapture(video_path)
-
-            if not cap.isOpened():
-                raise ValueError("Não foi possível abrir o vídeo")
-
-            counter = UniqueVehicleCounter()
-            last_graph_update = time.time()
-            last_fps_update = time.time()
-            fps_counter = 0
-            yolo_classes_to_track = [2, 3, 5, 7]
-
-            while cap.isOpened() and self._is_running:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                current_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
-                if self.frame_skip > 0 and current_frame % (self.frame_skip + 1) != 0:
-                    continue
-
-                results = model.track(frame, classes=yolo_classes_to_track, persist=True, verbose=False)
-                current_ids = set()
-                class_info = {}
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
 
-                if results[0].boxes.id is not None:
-                    boxes = results[0].boxes
-                    classes = results[0].boxes.cls.tolist()
+    def put(self, value):
+        with self._lock:
+            previous = self._value
+            self._value = value
+            return previous
 
-                    for box, obj_id, cls_id in zip(boxes.xyxy, boxes.id, classes):
-                        x1, y1, x2, y2 = map(int, box)
-                        track_id = int(obj_id)
-                        current_ids.add(track_id)
+    def take(self):
+        with self._lock:
+            value = self._value
+            self._value = None
+            return value
 
-                        simple_class = SIMPLE_VEHICLE_MAP.get(int(cls_id))
-                        class_info[track_id] = simple_class
-                        class_name = VEHICLE_CLASSES.get(int(cls_id), 'Veículo')
 
-                        color = (0, 255, 0) if simple_class == 'Carro' else \
-                                (255, 100, 0) if simple_class == 'Moto' else (0, 150, 255)
+class DisplayBufferPool:
+    """Buffers de exibição pré-alocados, trocados entre worker e GUI sem cópia.
 
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+    Com três buffers sempre há um livre: no máximo um está pendente no slot
+    e outro sendo convertido em QPixmap pela GUI.
+    """
 
-                        label = f"ID {track_id} - {class_name}"
-                        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                        cv2.rectangle(frame, (x1, y1 - h - 10), (x1 + w, y1), color, -1)
-                        cv2.putText(frame, label, (x1, y1 - 5),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    def __init__(self, count=3):
+        self._buffers = [None] * count
+        self._busy = set()
+        self._lock = threading.Lock()
 
-                new_count, total_unique = counter.add_new_ids(current_ids, class_info)
-                distribution = counter.class_counts.copy()
+    def acquire(self, shape):
+        with self._lock:
+            index = next(i for i in range(len(self._buffers)) if i not in self._busy)
+            self._busy.add(index)
+        buffer = self._buffers[index]
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[index] = buffer
+        return index, buffer
 
-                fps_counter += 1
-                if time.time() - last_fps_update > 1.0:
-                    fps = fps_counter / (time.time() - last_fps_update)
-                    self.fps_updated.emit(fps)
-                    fps_counter = 0
-                    last_fps_update = time.time()
+    def release(self, index):
+        with self._lock:
+            self._busy.discard(index)
 
-                self.frame_ready.emit(frame)
-                self.stats_updated.emit(total_unique, new_count)
-                self.vehicle_distribution.emit(distribution)
 
-                if time.time() - last_graph_update > 2.0:
-                    times, counts = counter.get_cumulative_data()
-                    class_data = {}
-                    for vtype in ['Carro', 'Moto', 'Caminhão']:
-                        t, c = counter.get_class_cumulative_data(vtype)
-                        class_data[vtype] = (t, c)
+class VideoWorker(QObject):
+    """Processa uma fonte, ou várias câmeras com um modelo compartilhado.
+
+    Com uma lista de URLs, cada câmera tem seu VehiclePipeline (contador,
+    rastreador e região próprios) e a inferência é conjunta, em rodízio
+    (MultiStreamPipeline). `regions` traz (roi, linha) de cada câmera no
+    lugar de roi/counting_line. A tela mostra uma câmera por vez, escolhida
+    com show_stream().
+    """
+
+    # Aviso sem dados: a GUI busca o estado mais recente com take_ui_update()
+    ui_update_ready = Signal()
+    graph_data_ready = Signal(dict)
+    # A câmera exibida mudou: o gráfico recomeça e recebe a série inteira dela
+    graph_reset = Signal()
+    processing_finished = Signal()
+    error_occurred = Signal(str)
+    fps_updated = Signal(float)
+    metrics_updated = Signal(dict)
 
-                    if len(times) > 0:
-                        self.graph_data_ready.emit(times, counts, class_data)
-                    last_graph_update = time.time()
+    def __init__(self, video_path, source_type, youtube_url, frame_skip, target_fps=None,
+                 prefetch_depth=4, batch_size=1, tracker='botsort', roi=None, counting_line=None,
+                 adaptive=False, target_rtf=1.0, motion_threshold=None, backend='torch',
+                 precision='fp32', profile=False, overlay='display', event_store=None,
+                 checkpoint_path=None, resume=False, max_ui_hz=30, regions=None):
+        super().__init__()
+        if source_type == "YouTube":
+            urls = [youtube_url] if isinstance(youtube_url, str) else list(youtube_url)
+        else:
+            urls = [None]
+        if regions is None:
+            regions = [(roi, counting_line)] * len(urls)
+        self.pipelines = [
+            VehiclePipeline(
+                video_path=video_path,
+                youtube_url=url,
+                frame_skip=frame_skip,
+                target_fps=target_fps,
+                prefetch_depth=prefetch_depth,
+                batch_size=batch_size,
+                tracker=tracker,
+                roi=regions[i][0],
+                counting_line=regions[i][1],
+                adaptive=adaptive,
+                target_rtf=target_rtf,
+                motion_threshold=motion_threshold,
+                backend=backend,
+                precision=precision,
+                profile=profile,
+                overlay=overlay,
+                event_store=event_store,
+                checkpoint_path=checkpoint_path,
+                resume=resume,
+                on_frame=lambda frame, i=i: self._on_frame(i, frame),
+                on_stats=lambda total, new, i=i: self._on_stats(i, total, new),
+                on_fps=lambda fps, i=i: self._emit_shown(i, self.fps_updated, fps),
+                on_graph=lambda series, i=i: self._emit_shown(i, self.graph_data_ready, series),
+                on_metrics=lambda metrics, i=i: self._emit_shown(i, self.metrics_updated, metrics)
+            )
+            for i, url in enumerate(urls)
+        ]
+        self.engine = None
+        if len(self.pipelines) > 1:
+            from multistream import MultiStreamPipeline
+            self.engine = MultiStreamPipeline(self.pipelines,
+                                              batch_size=max(batch_size, len(self.pipelines)))
+        # Índice exibido; a troca pedida pela GUI é aplicada na thread do worker
+        self._shown = 0
+        self._requested = 0
+        self._ui_slot = LatestValueSlot()
+        self._display_pool = DisplayBufferPool()
+        self._display_size = None
+        self._min_ui_interval = 1.0 / max_ui_hz
+        self._last_ui_update = 0.0
+        self._latest_frame = None
+        self._latest_tracks = None
+        self._new_since_update = 0
+        self._coalesced = 0
+
+    @property
+    def pipeline(self):
+        """Pipeline da câmera exibida."""
+        return self.pipelines[self._shown]
+
+    @property
+    def profiler(self):
+        return self.pipeline.profiler
+
+    def show_stream(self, index):
+        """Chamado pela GUI para trocar a câmera exibida."""
+        self._requested = index
+
+    def _switch_stream(self):
+        self._shown = self._requested
+        pipeline = self.pipeline
+        # Próximo frame dela reenvia as curvas desde o início
+        pipeline._graph_sent = {}
+        pipeline.last_graph_update = 0.0
+        self._new_since_update = 0
+        self._last_ui_update = 0.0
+        self.graph_reset.emit()
+
+    def _emit_shown(self, index, signal, value):
+        if index == self._shown:
+            signal.emit(value)
+
+    def _on_frame(self, index, frame):
+        # A câmera atual continua na tela até a pedida mandar um frame
+        if index == self._requested and index != self._shown:
+            self._switch_stream()
+        if index != self._shown:
+            return
+        self._latest_frame = frame
+        self._latest_tracks = self.pipeline.current_tracks
 
-            cap.release()
+    def _on_stats(self, index, total_unique, new_count):
+        if index != self._shown:
+            return
+        self._new_since_update += new_count
+        now = time.monotonic()
+        if now - self._last_ui_update < self._min_ui_interval:
+            return
+        self._last_ui_update = now
+
+        # O frame do anel já sai redimensionado para um buffer de exibição
+        stage_start = time.perf_counter()
+        self._publish(self._render_display_frame(self._latest_frame), total_unique)
+        self.profiler.add('display', time.perf_counter() - stage_start)
+
+    def _render_display_frame(self, frame):
+        h, w = frame.shape[:2]
+        target = self._display_size
+        if target and target[0] > 0 and target[1] > 0:
+            scale = min(target[0] / w, target[1] / h)
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        else:
+            scale, size = 1.0, (w, h)
+
+        index, buffer = self._display_pool.acquire((size[1], size[0], 3))
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        cv2.resize(frame, size, dst=buffer, interpolation=interpolation)
+
+        # Só os frames que chegam à tela são anotados, já no tamanho da tela
+        if self.pipeline.overlay == 'display':
+            stage_start = time.perf_counter()
+            self.pipeline.draw_overlay(buffer, self._latest_tracks, scale)
+            self.profiler.add('overlay', time.perf_counter() - stage_start)
+        return index, buffer
+
+    def _publish(self, display_frame, total_unique):
+        update = (display_frame, total_unique, self._new_since_update,
+                  dict(self.pipeline.counter.class_counts))
+        self._new_since_update = 0
+        previous = self._ui_slot.put(update)
+        if previous is None:
+            self.ui_update_ready.emit()
+        else:
+            # A GUI não chegou a ver a atualização substituída
+            self._coalesced += 1
+            self.profiler.set_gauge('ui_updates_coalesced', self._coalesced)
+            if previous[0] is not None:
+                self._display_pool.release(previous[0][0])
+
+    def set_display_size(self, width, height):
+        """Chamado pela GUI quando o tamanho da área de vídeo muda."""
+        self._display_size = (width, height)
+
+    def take_ui_update(self):
+        """((índice, frame BGR), total, novos, distribuição) ou None.
+
+        O frame já vem no tamanho da área de vídeo; devolva-o com
+        release_display_frame(índice) depois de convertê-lo.
+        """
+        return self._ui_slot.take()
+
+    def release_display_frame(self, index):
+        self._display_pool.release(index)
 
+    @Slot()
+    def run(self):
+        try:
+            if self.engine is not None:
+                self.engine.run()
+            else:
+                self.pipeline.run()
+            # Estatísticas finais que o limitador de taxa possa ter segurado
+            self._publish(None, self.pipeline.counter.total_unique)
         except Exception as e:
             self.error_occurred.emit(f"Erro no processamento: {str(e)}")
         finally:
             self.processing_finished.emit()
 
     def stop(self):
-        self._is_running = False
+        if self.engine is not None:
+            self.engine.stop()
+        else:
+            self.pipeline.stop()
 
 # ========== WIDGET DE ESTATÍSTICAS ==========
 class StatsCard(QFrame):
@@ -277,6 +320,89 @@ class StatsCard(QFrame):
     def set_value(self, value):
         self.value_label.setText(str(value))
 
+# ========== PAINEL DE MÉTRICAS ==========
+class MetricsPanel(QFrame):
+    """p50 · p95 · p99 (ms por frame) de cada etapa e a fila de decodificação."""
+
+    def __init__(self):
+        super().__init__()
+        self.setObjectName("MetricsPanel")
+        layout = QHBoxLayout()
+        layout.setContentsMargins(10, 4, 10, 4)
+        layout.setSpacing(14)
+
+        # Uma coluna por etapa, na ordem do pipeline; aparece ao receber a primeira medição
+        self.stage_labels = {}
+        for stage in STAGES:
+            label = self._column(stage)
+            label.setVisible(False)
+            self.stage_labels[stage] = label
+            layout.addWidget(label)
+        self.queue_label = self._column("filas")
+        layout.addWidget(self.queue_label)
+        self.setLayout(layout)
+
+    def _column(self, name):
+        label = QLabel(f"<b>{name}</b><br>--")
+        label.setObjectName("MetricsColumn")
+        label.setTextFormat(Qt.TextFormat.RichText)
+        return label
+
+    def update_metrics(self, metrics):
+        for stage, stats in metrics['stages'].items():
+            label = self.stage_labels.get(stage)
+            if label is None:
+                continue
+            label.setText(f"<b>{stage}</b><br>{stats['p50_ms']:.1f} · {stats['p95_ms']:.1f} · "
+                          f"{stats['p99_ms']:.1f}")
+            label.setVisible(True)
+        gauges = metrics['gauges']
+        self.queue_label.setText(
+            f"<b>filas</b><br>decod. {gauges.get('prefetch_queue_depth', 0)} · "
+            f"descart. {gauges.get('frames_dropped', 0)} · "
+            f"UI {gauges.get('ui_updates_coalesced', 0)}")
+
+    def clear(self):
+        for stage, label in self.stage_labels.items():
+            label.setText(f"<b>{stage}</b><br>--")
+            label.setVisible(False)
+        self.queue_label.setText("<b>filas</b><br>--")
+
+# ========== BUFFER DO GRÁFICO ACUMULADO ==========
+class GraphRingBuffer:
+    """Últimos `capacity` pontos de uma curva, sempre contíguos na memória.
+
+    Cada ponto é escrito duas vezes (posição p e p + capacity), então a
+    janela visível é uma fatia simples, entregue ao setData sem cópia.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0  # pontos recebidos desde o início (índice do próximo)
+        self._times = np.zeros(2 * capacity)
+        self._counts = np.zeros(2 * capacity)
+
+    def extend(self, start, times, counts):
+        """Grava os pontos a partir do índice global `start` (sobrescreve os já recebidos)."""
+        skipped = max(0, len(times) - self.capacity)
+        times = np.asarray(times)[skipped:]
+        counts = np.asarray(counts)[skipped:]
+        if len(times) == 0:
+            return
+        indices = start + skipped + np.arange(len(times))
+        positions = indices % self.capacity
+        self._times[positions] = times
+        self._times[positions + self.capacity] = times
+        self._counts[positions] = counts
+        self._counts[positions + self.capacity] = counts
+        self.total = max(self.total, int(indices[-1]) + 1)
+
+    def view(self):
+        n = min(self.total, self.capacity)
+        first = (self.total - n) % self.capacity
+        return self._times[first:first + n], self._counts[first:first + n]
+
+
 # ========== WIDGET DE GRÁFICO DE PIZZA PYQTGRAPH ==========
 class DonutChartWidget(QWidget):
     def __init__(self):
@@ -312,8 +438,17 @@ class DonutChartWidget(QWidget):
 
         self.data = {'Carro': 0, 'Moto': 0, 'Caminhão': 0}
 
+        # Geometria reutilizada em todos os redesenhos
+        self._arc_steps = np.linspace(0, 1, 100)
+        theta_center = np.linspace(0, 2*np.pi, 100)
+        self._center_x = 0.6 * np.cos(theta_center)
+        self._center_y = 0.6 * np.sin(theta_center)
+
     def update_data(self, data):
-        self.data = data
+        # Contagens iguais: nada a redesenhar
+        if data == self.data:
+            return
+        self.data = dict(data)
         total = sum(data.values())
 
         for vtype, count in data.items():
@@ -339,8 +474,7 @@ class DonutChartWidget(QWidget):
 
             angle = (count / total) * 360
 
-            theta = np.linspace(np.deg2rad(start_angle), 
-                              np.deg2rad(start_angle + angle), 100)
+            theta = np.deg2rad(start_angle + angle * self._arc_steps)
 
             x_outer = outer_radius * np.cos(theta)
             y_outer = outer_radius * np.sin(theta)
@@ -357,10 +491,7 @@ class DonutChartWidget(QWidget):
 
             start_angle += angle
 
-        theta_center = np.linspace(0, 2*np.pi, 100)
-        x_center = inner_radius * np.cos(theta_center)
-        y_center = inner_radius * np.sin(theta_center)
-        self.plot_widget.plot(x_center, y_center, fillLevel=0, 
+        self.plot_widget.plot(self._center_x, self._center_y, fillLevel=0, 
                              brush=pg.mkBrush((30, 30, 30)), 
                              pen=pg.mkPen(None))
 
@@ -373,6 +504,7 @@ class MainWindow(QMainWindow):
         self.video_path = None
         self.worker_thread = None
         self.video_worker = None
+        self.event_store = None
         self.init_ui()
         self.apply_professional_stylesheet()
 
@@ -398,6 +530,10 @@ class MainWindow(QMainWindow):
         header_layout.addLayout(title_layout)
         header_layout.addStretch()
 
+        self.metrics_panel = MetricsPanel()
+        self.metrics_panel.setVisible(False)
+        header_layout.addWidget(self.metrics_panel)
+
         self.fps_label = QLabel("FPS: --")
         self.fps_label.setObjectName("FPSLabel")
         header_layout.addWidget(self.fps_label)
@@ -447,8 +583,13 @@ class MainWindow(QMainWindow):
         self.selected_file_label.setObjectName("InfoLabel")
         self.selected_file_label.setWordWrap(True)
 
+        # Vídeos longos: parar ou fechar não perde o que já foi processado
+        self.checkpoint_check = QCheckBox("💾 Salvar progresso para retomar depois")
+        self.checkpoint_check.setChecked(True)
+
         upload_layout.addWidget(self.btn_select_file)
         upload_layout.addWidget(self.selected_file_label)
+        upload_layout.addWidget(self.checkpoint_check)
         upload_group.setLayout(upload_layout)
         source_layout.addWidget(upload_group)
 
@@ -458,19 +599,35 @@ class MainWindow(QMainWindow):
 
         self.youtube_input = QLineEdit()
         self.youtube_input.setPlaceholderText("Cole o link do YouTube aqui...")
+        self.youtube_input.setToolTip("Várias câmeras: links separados por espaço, "
+                                      "com um modelo compartilhado entre elas")
         self.youtube_input.setEnabled(False)
+        self.youtube_input.editingFinished.connect(self.update_stream_list)
+
+        # Com várias câmeras: qual aparece na tela e tem a região editada
+        self.stream_label = QLabel("Câmera exibida:")
+        self.stream_combo = QComboBox()
+        self.stream_combo.currentIndexChanged.connect(self.change_stream)
+        self.stream_label.setVisible(False)
+        self.stream_combo.setVisible(False)
 
         info_label = QLabel("ℹ️ Sempre usa streaming direto (não baixa o vídeo)")
         info_label.setStyleSheet("color: #00d9ff; font-size: 11px; font-style: italic;")
 
         youtube_layout.addWidget(QLabel("URL do vídeo:"))
         youtube_layout.addWidget(self.youtube_input)
+        youtube_layout.addWidget(self.stream_label)
+        youtube_layout.addWidget(self.stream_combo)
         youtube_layout.addWidget(info_label)
         youtube_group.setLayout(youtube_layout)
         source_layout.addWidget(youtube_group)
 
         self.radio_upload.toggled.connect(self.toggle_source_controls)
 
+        # Histórico que sobrevive ao fechamento da janela (consulta com store.py)
+        self.events_check = QCheckBox("💾 Gravar cada veículo contado em events.db")
+        source_layout.addWidget(self.events_check)
+
         source_layout.addStretch()
         source_tab.setLayout(source_layout)
 
@@ -496,14 +653,153 @@ class MainWindow(QMainWindow):
         perf_inner.addWidget(skip_label)
         perf_inner.addWidget(self.frame_skip_slider)
         perf_inner.addWidget(self.frame_skip_value, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        self.time_sampling_check = QCheckBox("Amostrar por tempo de vídeo")
+        self.target_fps_spin = QSpinBox()
+        self.target_fps_spin.setRange(1, 30)
+        self.target_fps_spin.setValue(5)
+        self.target_fps_spin.setSuffix(" frames/s de vídeo")
+        self.target_fps_spin.setEnabled(False)
+        self.time_sampling_check.toggled.connect(self.toggle_time_sampling)
+
+        perf_inner.addWidget(self.time_sampling_check)
+        perf_inner.addWidget(self.target_fps_spin)
+
+        self.prefetch_spin = QSpinBox()
+        self.prefetch_spin.setRange(1, 32)
+        self.prefetch_spin.setValue(4)
+        self.prefetch_spin.setSuffix(" frames")
+
+        perf_inner.addWidget(QLabel("Buffer de decodificação antecipada"))
+        perf_inner.addWidget(self.prefetch_spin)
+
+        self.batch_spin = QSpinBox()
+        self.batch_spin.setRange(1, 32)
+        self.batch_spin.setValue(1)
+        self.batch_spin.setSuffix(" frames por lote")
+
+        perf_inner.addWidget(QLabel("Inferência em lote (somente arquivos locais)"))
+        perf_inner.addWidget(self.batch_spin)
+        # Rastreadores mais leves trocam robustez por frames por segundo
+        self.tracker_combo = QComboBox()
+        self.tracker_combo.addItem("BoT-SORT (ultralytics)", "botsort")
+        self.tracker_combo.addItem("ByteTrack (ultralytics)", "bytetrack")
+        self.tracker_combo.addItem("Euclidiano (leve, CPU)", "euclidean")
+
+        perf_inner.addWidget(QLabel("Rastreador"))
+        perf_inner.addWidget(self.tracker_combo)
+
+        self.ui_hz_spin = QSpinBox()
+        self.ui_hz_spin.setRange(1, 60)
+        self.ui_hz_spin.setValue(30)
+        self.ui_hz_spin.setSuffix(" Hz")
+
+        perf_inner.addWidget(QLabel("Atualização máxima da interface"))
+        perf_inner.addWidget(self.ui_hz_spin)
+
+        self.graph_window_spin = QSpinBox()
+        self.graph_window_spin.setRange(0, 86400)
+        self.graph_window_spin.setSingleStep(60)
+        self.graph_window_spin.setValue(0)
+        self.graph_window_spin.setSuffix(" s")
+        self.graph_window_spin.setSpecialValueText("Tudo")
+
+        perf_inner.addWidget(QLabel("Janela visível do gráfico"))
+        perf_inner.addWidget(self.graph_window_spin)
+        # Reduz imgsz e aumenta o salto sozinho quando o processamento fica para trás
+        self.adaptive_check = QCheckBox("Governador adaptativo")
+        self.target_rtf_spin = QDoubleSpinBox()
+        self.target_rtf_spin.setRange(0.1, 4.0)
+        self.target_rtf_spin.setSingleStep(0.1)
+        self.target_rtf_spin.setValue(1.0)
+        self.target_rtf_spin.setSuffix(" × tempo real")
+        self.target_rtf_spin.setEnabled(False)
+        self.adaptive_check.toggled.connect(self.target_rtf_spin.setEnabled)
+
+        perf_inner.addWidget(self.adaptive_check)
+        perf_inner.addWidget(self.target_rtf_spin)
+        # Cenas paradas (noite, semáforo fechado) reaproveitam as detecções anteriores
+        self.motion_check = QCheckBox("Pular inferência sem movimento")
+        self.motion_spin = QDoubleSpinBox()
+        self.motion_spin.setDecimals(2)
+        self.motion_spin.setRange(0.01, 10.0)
+        self.motion_spin.setSingleStep(0.05)
+        self.motion_spin.setValue(0.2)
+        self.motion_spin.setSuffix(" % de pixels alterados")
+        self.motion_spin.setEnabled(False)
+        self.motion_check.toggled.connect(self.motion_spin.setEnabled)
+
+        perf_inner.addWidget(self.motion_check)
+        perf_inner.addWidget(self.motion_spin)
+        # ONNX/OpenVINO exportam o modelo na primeira execução e reaproveitam o arquivo
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("PyTorch", "torch")
+        self.backend_combo.addItem("ONNX Runtime (CPU)", "onnx")
+        self.backend_combo.addItem("OpenVINO (CPU Intel)", "openvino")
+        self.precision_combo = QComboBox()
+        self.backend_combo.currentIndexChanged.connect(self.update_precision_options)
+        self.update_precision_options()
+
+        perf_inner.addWidget(QLabel("Backend de inferência"))
+        perf_inner.addWidget(self.backend_combo)
+        perf_inner.addWidget(QLabel("Precisão dos pesos"))
+        perf_inner.addWidget(self.precision_combo)
+        # Desenhar na imagem já reduzida só custa nos frames que aparecem na tela
+        self.overlay_combo = QComboBox()
+        self.overlay_combo.addItem("Na resolução da tela", "display")
+        self.overlay_combo.addItem("Na resolução original", "full")
+        self.overlay_combo.addItem("Desligado", "off")
+        self.overlay_combo.currentIndexChanged.connect(self.change_overlay_mode)
+
+        perf_inner.addWidget(QLabel("Caixas e rótulos (overlay)"))
+        perf_inner.addWidget(self.overlay_combo)
+        # Percentis por etapa no cabeçalho; pode ser ligado durante o processamento
+        self.metrics_check = QCheckBox("Métricas por etapa (p50 · p95 · p99 ms)")
+        self.metrics_check.toggled.connect(self.toggle_metrics)
+
+        perf_inner.addWidget(self.metrics_check)
         perf_group.setLayout(perf_inner)
         perf_layout.addWidget(perf_group)
 
         perf_layout.addStretch()
         perf_tab.setLayout(perf_layout)
 
+        region_tab = QWidget()
+        region_layout = QVBoxLayout()
+        region_layout.setSpacing(15)
+
+        region_group = QGroupBox("🎯 Região de Interesse")
+        region_group.setObjectName("ConfigGroup")
+        region_inner = QVBoxLayout()
+
+        self.roi_input = QLineEdit()
+        self.roi_input.setPlaceholderText("x1,y1; x2,y2; x3,y3; ...")
+        self.line_input = QLineEdit()
+        self.line_input.setPlaceholderText("x1,y1; x2,y2")
+
+        region_info = QLabel("ℹ️ Coordenadas em pixels do vídeo original. A inferência roda só "
+                             "no recorte da região; com a linha, só conta quem a cruza.")
+        region_info.setWordWrap(True)
+        region_info.setStyleSheet("color: #00d9ff; font-size: 11px; font-style: italic;")
+
+        self.btn_save_region = QPushButton("💾 Salvar para esta fonte")
+        self.btn_save_region.clicked.connect(self.save_region)
+
+        region_inner.addWidget(QLabel("Polígono da região (opcional)"))
+        region_inner.addWidget(self.roi_input)
+        region_inner.addWidget(QLabel("Linha de contagem (opcional)"))
+        region_inner.addWidget(self.line_input)
+        region_inner.addWidget(region_info)
+        region_inner.addWidget(self.btn_save_region)
+        region_group.setLayout(region_inner)
+        region_layout.addWidget(region_group)
+
+        region_layout.addStretch()
+        region_tab.setLayout(region_layout)
+
         tabs.addTab(source_tab, "📹 Fonte")
         tabs.addTab(perf_tab, "⚙️ Performance")
+        tabs.addTab(region_tab, "🎯 Região")
 
         left_layout.addWidget(tabs)
 
@@ -562,6 +858,9 @@ class MainWindow(QMainWindow):
         self.graph_widget.setLabel('bottom', 'Tempo (segundos)', color='#ccc', size='12pt')
         self.graph_widget.showGrid(x=True, y=True, alpha=0.3)
         self.graph_widget.setMouseEnabled(x=True, y=True)
+        # Desenha só o trecho visível, reduzido por pico para não perder saltos
+        self.graph_widget.setClipToView(True)
+        self.graph_widget.setDownsampling(auto=True, mode='peak')
 
         self.plot_line_total = self.graph_widget.plot([], [], pen=pg.mkPen('#00d9ff', width=3), 
                                                        name='Total')
@@ -574,6 +873,14 @@ class MainWindow(QMainWindow):
 
         self.graph_widget.addLegend()
 
+        self.graph_lines = {
+            'Total': self.plot_line_total,
+            'Carro': self.plot_line_car,
+            'Moto': self.plot_line_moto,
+            'Caminhão': self.plot_line_truck,
+        }
+        self.graph_buffers = {}
+
         graph_layout.addWidget(self.graph_widget)
         graph_container.setLayout(graph_layout)
         graphs_layout.addWidget(graph_container, 2)
@@ -615,6 +922,8 @@ class MainWindow(QMainWindow):
             }
             #HeaderTitle { font-size: 28px; font-weight: bold; color: #00d9ff; padding-left: 20px; }
             #HeaderSubtitle { font-size: 14px; color: #a0a0a0; padding-left: 20px; }
+            #MetricsPanel { background: rgba(255, 255, 255, 0.04); border-radius: 10px; }
+            #MetricsColumn { font-family: monospace; font-size: 11px; color: #bbb; }
             #FPSLabel {
                 font-size: 16px; font-weight: bold; color: #00ff88;
                 background: rgba(0, 255, 136, 0.1); padding: 8px 20px;
@@ -683,6 +992,26 @@ class MainWindow(QMainWindow):
         self.btn_select_file.setEnabled(is_upload)
         self.youtube_input.setEnabled(not is_upload)
 
+    @Slot(bool)
+    def toggle_time_sampling(self, checked):
+        self.target_fps_spin.setEnabled(checked)
+        self.frame_skip_slider.setEnabled(not checked)
+
+    def toggle_metrics(self, checked):
+        self.metrics_panel.setVisible(checked)
+        if self.video_worker is not None:
+            for pipeline in self.video_worker.pipelines:
+                pipeline.profiler.enabled = checked
+
+    def change_overlay_mode(self):
+        if self.video_worker is not None:
+            for pipeline in self.video_worker.pipelines:
+                pipeline.overlay = self.overlay_combo.currentData()
+
+    def update_precision_options(self):
+        self.precision_combo.clear()
+        self.precision_combo.addItems(INFERENCE_BACKENDS[self.backend_combo.currentData()])
+
     @Slot()
     def select_file(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -693,6 +1022,59 @@ class MainWindow(QMainWindow):
             self.video_path = file_name
             self.selected_file_label.setText(f"✓ {Path(file_name).name}")
             self.selected_file_label.setStyleSheet("color: #00ff88;")
+            self.load_region()
+
+    def youtube_urls(self):
+        return self.youtube_input.text().split()
+
+    def current_source(self):
+        if self.radio_upload.isChecked():
+            return self.video_path
+        urls = self.youtube_urls()
+        index = max(0, self.stream_combo.currentIndex())
+        return urls[index] if index < len(urls) else ""
+
+    @Slot()
+    def update_stream_list(self):
+        # Durante o processamento a lista acompanha as câmeras que estão rodando
+        if self.video_worker is None:
+            urls = self.youtube_urls()
+            self.stream_combo.blockSignals(True)
+            self.stream_combo.clear()
+            self.stream_combo.addItems([f"{i + 1}. {url}" for i, url in enumerate(urls)])
+            self.stream_combo.blockSignals(False)
+            self.stream_label.setVisible(len(urls) > 1)
+            self.stream_combo.setVisible(len(urls) > 1)
+        self.load_region()
+
+    @Slot(int)
+    def change_stream(self, index):
+        if index < 0:
+            return
+        self.load_region()
+        if self.video_worker is not None:
+            self.video_worker.show_stream(index)
+
+    @Slot()
+    def load_region(self):
+        config = load_region_config(self.current_source())
+        self.roi_input.setText(format_points(config.get('roi', [])))
+        self.line_input.setText(format_points(config.get('line', [])))
+
+    @Slot()
+    def save_region(self):
+        source = self.current_source()
+        if not source:
+            QMessageBox.warning(self, "Aviso", "Escolha a fonte do vídeo antes de salvar a região.")
+            return
+        try:
+            roi = parse_points(self.roi_input.text())
+            line = parse_points(self.line_input.text())
+        except ValueError:
+            QMessageBox.critical(self, "Erro", "Use o formato x,y; x,y; ... para os pontos.")
+            return
+        save_region_config(source, roi, line)
+        self.status_label.setText("💾 Região salva para esta fonte")
 
     @Slot()
     def start_processing(self):
@@ -701,17 +1083,70 @@ class MainWindow(QMainWindow):
             return
 
         source_type = "Upload" if self.radio_upload.isChecked() else "YouTube"
-        youtube_url = self.youtube_input.text().strip()
+        youtube_urls = self.youtube_urls()
         frame_skip = self.frame_skip_slider.value()
+        target_fps = self.target_fps_spin.value() if self.time_sampling_check.isChecked() else None
 
         if source_type == "Upload" and (not self.video_path or not os.path.exists(self.video_path)):
             QMessageBox.critical(self, "Erro", "Selecione um arquivo de vídeo válido!")
             return
 
-        if source_type == "YouTube" and not youtube_url:
+        if source_type == "YouTube" and not youtube_urls:
             QMessageBox.critical(self, "Erro", "Insira um link do YouTube válido!")
             return
 
+        multi_stream = source_type == "YouTube" and len(youtube_urls) > 1
+        if multi_stream and self.adaptive_check.isChecked():
+            QMessageBox.critical(self, "Erro", "O governador adaptativo não funciona com várias câmeras.")
+            return
+
+        try:
+            roi = parse_points(self.roi_input.text()) or None
+            counting_line = parse_points(self.line_input.text()) or None
+        except ValueError:
+            QMessageBox.critical(self, "Erro", "Use o formato x,y; x,y; ... para os pontos da região.")
+            return
+        if roi is not None and len(roi) < 3:
+            QMessageBox.critical(self, "Erro", "A região de interesse precisa de pelo menos 3 pontos.")
+            return
+        if counting_line is not None and len(counting_line) != 2:
+            QMessageBox.critical(self, "Erro", "A linha de contagem precisa de exatamente 2 pontos.")
+            return
+
+        # Várias câmeras: os campos valem para a selecionada, as outras usam a região salva
+        regions = None
+        if multi_stream:
+            if self.stream_combo.count() != len(youtube_urls):
+                self.update_stream_list()
+            selected = max(0, self.stream_combo.currentIndex())
+            regions = []
+            for i, url in enumerate(youtube_urls):
+                if i == selected:
+                    regions.append((roi, counting_line))
+                else:
+                    saved = load_region_config(url)
+                    regions.append((saved.get('roi') or None, saved.get('line') or None))
+
+        checkpoint = None
+        resume = False
+        if source_type == "Upload" and self.checkpoint_check.isChecked():
+            checkpoint = checkpoint_path(self.video_path)
+            if checkpoint.exists():
+                answer = QMessageBox.question(
+                    self, "Progresso salvo",
+                    "Este vídeo foi interrompido antes do fim. Continuar de onde parou?\n"
+                    "(Não: processa do início e descarta o progresso salvo)")
+                resume = answer == QMessageBox.StandardButton.Yes
+                if not resume:
+                    remove_checkpoint(checkpoint)
+
+        if self.events_check.isChecked() and self.event_store is None:
+            try:
+                self.event_store = EventStore()
+            except sqlite3.Error as e:
+                QMessageBox.critical(self, "Erro", f"Não foi possível abrir events.db: {e}")
+                return
+
         self.btn_process.setText("⏹️ PARAR PROCESSAMENTO")
         self.btn_process.clicked.disconnect()
         self.btn_process.clicked.connect(self.stop_processing)
@@ -721,18 +1156,41 @@ class MainWindow(QMainWindow):
         self.video_worker = VideoWorker(
             video_path=self.video_path,
             source_type=source_type,
-            youtube_url=youtube_url,
-            frame_skip=frame_skip
+            youtube_url=youtube_urls,
+            frame_skip=frame_skip,
+            target_fps=target_fps,
+            prefetch_depth=self.prefetch_spin.value(),
+            batch_size=self.batch_spin.value(),
+            tracker=self.tracker_combo.currentData(),
+            roi=roi,
+            counting_line=counting_line,
+            adaptive=self.adaptive_check.isChecked(),
+            target_rtf=self.target_rtf_spin.value(),
+            motion_threshold=(self.motion_spin.value() / 100
+                              if self.motion_check.isChecked() else None),
+            backend=self.backend_combo.currentData(),
+            precision=self.precision_combo.currentText(),
+            profile=self.metrics_check.isChecked(),
+            overlay=self.overlay_combo.currentData(),
+            event_store=self.event_store if self.events_check.isChecked() else None,
+            checkpoint_path=checkpoint,
+            resume=resume,
+            max_ui_hz=self.ui_hz_spin.value(),
+            regions=regions
         )
+        self.video_worker.show_stream(max(0, self.stream_combo.currentIndex()))
 
+        self.video_worker.set_display_size(self.video_label.width(), self.video_label.height())
+        self.reset_graph()
+        self.metrics_panel.clear()
         self.video_worker.moveToThread(self.worker_thread)
         self.worker_thread.started.connect(self.video_worker.run)
 
-        self.video_worker.frame_ready.connect(self.update_video_frame)
-        self.video_worker.stats_updated.connect(self.update_stats)
+        self.video_worker.ui_update_ready.connect(self.apply_ui_update)
         self.video_worker.graph_data_ready.connect(self.update_graph)
-        self.video_worker.vehicle_distribution.connect(self.update_vehicle_distribution)
+        self.video_worker.graph_reset.connect(self.reset_graph)
         self.video_worker.fps_updated.connect(self.update_fps)
+        self.video_worker.metrics_updated.connect(self.metrics_panel.update_metrics)
         self.video_worker.processing_finished.connect(self.processing_finished)
         self.video_worker.error_occurred.connect(self.processing_error)
 
@@ -744,16 +1202,35 @@ class MainWindow(QMainWindow):
             self.video_worker.stop()
             self.status_label.setText("⏹️ Parando processamento...")
 
+    @Slot()
+    def apply_ui_update(self):
+        if self.video_worker is None:
+            return
+        worker = self.video_worker
+        label_size = (self.video_label.width(), self.video_label.height())
+        worker.set_display_size(*label_size)
+
+        update = worker.take_ui_update()
+        if update is None:
+            return
+        stage_start = time.perf_counter()
+        display_frame, total_unique, new_count, distribution = update
+        if display_frame is not None:
+            index, frame = display_frame
+            try:
+                self.update_video_frame(frame)
+            finally:
+                worker.release_display_frame(index)
+        self.update_stats(total_unique, new_count)
+        self.update_vehicle_distribution(distribution)
+        worker.profiler.add('gui', time.perf_counter() - stage_start)
+
     @Slot(np.ndarray)
     def update_video_frame(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        q_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        self.video_label.setPixmap(QPixmap.fromImage(q_image).scaled(
-            self.video_label.size(), Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        ))
+        # Frame BGR já no tamanho do label: sem conversão de cor nem escala aqui
+        h, w, ch = frame.shape
+        q_image = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
+        self.video_label.setPixmap(QPixmap.fromImage(q_image))
 
     @Slot(int, int)
     def update_stats(self, total_unique, new_count):
@@ -761,20 +1238,24 @@ class MainWindow(QMainWindow):
         self.card_new.set_value(new_count)
         self.status_label.setText(f"▶️ Processando... | Total: {total_unique} | Novos: {new_count}")
 
-    @Slot(object, object, dict)
-    def update_graph(self, times, counts, class_data):
-        if len(times) > 0:
-            self.plot_line_total.setData(times, counts)
-
-            for vtype, color in [('Carro', '#4CAF50'), ('Moto', '#F44336'), ('Caminhão', '#FF9800')]:
-                t, c = class_data.get(vtype, ([], []))
-                if len(t) > 0:
-                    if vtype == 'Carro':
-                        self.plot_line_car.setData(t, c)
-                    elif vtype == 'Moto':
-                        self.plot_line_moto.setData(t, c)
-                    elif vtype == 'Caminhão':
-                        self.plot_line_truck.setData(t, c)
+    def reset_graph(self):
+        self.graph_buffers = {name: GraphRingBuffer(GRAPH_CAPACITY) for name in self.graph_lines}
+        for line in self.graph_lines.values():
+            line.setData([], [])
+
+    @Slot(dict)
+    def update_graph(self, series):
+        last_time = None
+        for name, (start, times, counts) in series.items():
+            buffer = self.graph_buffers[name]
+            buffer.extend(start, times, counts)
+            self.graph_lines[name].setData(*buffer.view())
+            if name == 'Total' and len(times) > 0:
+                last_time = times[-1]
+
+        window = self.graph_window_spin.value()
+        if window > 0 and last_time is not None:
+            self.graph_widget.setXRange(max(0.0, last_time - window), last_time, padding=0)
 
     @Slot(dict)
     def update_vehicle_distribution(self, distribution):
@@ -786,7 +1267,19 @@ class MainWindow(QMainWindow):
 
     @Slot()
     def processing_finished(self):
-        self.status_label.setText("✅ Processamento concluído com sucesso!")
+        status = "✅ Processamento concluído com sucesso!"
+        gate = self.video_worker.pipeline.motion_gate if self.video_worker else None
+        if gate is not None:
+            status += f" Inferências evitadas: {gate.skipped} de {gate.checked} frames"
+        resumed_from = self.video_worker.pipeline.resumed_from if self.video_worker else None
+        if resumed_from is not None:
+            status += f" (retomado do frame {resumed_from})"
+        engine = self.video_worker.engine if self.video_worker else None
+        if engine is not None and engine.failures:
+            for pipeline, error in engine.failures:
+                logger.warning("Câmera %s não abriu: %s", pipeline.youtube_url, error)
+            status += f" | {len(engine.failures)} câmera(s) não abriram"
+        self.status_label.setText(status)
         self.btn_process.setText("▶️ INICIAR PROCESSAMENTO")
         self.btn_process.clicked.disconnect()
         self.btn_process.clicked.connect(self.start_processing)
@@ -814,10 +1307,14 @@ class MainWindow(QMainWindow):
         if self.video_worker:
             self.video_worker.stop()
         self.cleanup_thread()
+        if self.event_store is not None:
+            # Grava os eventos que ainda estão na fila
+            self.event_store.close()
         event.accept()
 
 # ========== EXECUÇÃO ==========
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
 
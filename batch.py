@@ -0,0 +1,201 @@
+# batch.py
+# Processamento de vários vídeos em paralelo com um pool de processos
+# Cada processo carrega o modelo uma única vez (load_model no initializer);
+# process_streams processa várias câmeras num só processo, modelo compartilhado
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.mpeg4'}
+
+VEHICLE_TYPES = ['Carro', 'Moto', 'Caminhão']
+
+# Modelo do processo atual, carregado por _init_worker
+_worker_model = None
+
+
+def is_youtube_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def expand_inputs(inputs):
+    """Troca pastas pelos vídeos que elas contêm (ordenados); mantém arquivos e links.
+
+    Cada fonte aparece uma vez só, na primeira posição em que foi passada
+    (ex.: uma pasta e um vídeo dela): repetida, ela dividiria o checkpoint e
+    o arquivo de saída e seria somada duas vezes no relatório.
+    """
+    sources = []
+    seen = set()
+    for item in inputs:
+        path = Path(item)
+        if not is_youtube_url(item) and path.is_dir():
+            found = [str(p) for p in sorted(path.iterdir())
+                     if p.suffix.lower() in VIDEO_EXTENSIONS]
+        else:
+            found = [item]
+        for source in found:
+            key = source if is_youtube_url(source) else os.path.normcase(os.path.abspath(source))
+            if key not in seen:
+                seen.add(key)
+                sources.append(source)
+    return sources
+
+
+def build_pipeline(source, options, model=None, event_store=None):
+    """VehiclePipeline para a fonte; sem roi/counting_line nas opções, usa a região salva.
+
+    Com 'checkpoint_dir' nas opções, arquivos locais ganham um checkpoint nessa pasta.
+    """
+    from checkpoint import checkpoint_path
+    from pipeline import VehiclePipeline
+    from region import load_region_config
+
+    options = dict(options)
+    saved = load_region_config(source)
+    if options.get('roi') is None:
+        options['roi'] = saved.get('roi') or None
+    if options.get('counting_line') is None:
+        options['counting_line'] = saved.get('line') or None
+    checkpoint_dir = options.pop('checkpoint_dir', None)
+    if checkpoint_dir is not None and not is_youtube_url(source):
+        options['checkpoint_path'] = checkpoint_path(source, checkpoint_dir)
+
+    return VehiclePipeline(
+        video_path=None if is_youtube_url(source) else source,
+        youtube_url=source if is_youtube_url(source) else None,
+        model=model,
+        event_store=event_store,
+        **options
+    )
+
+
+def summarize(pipeline, source):
+    summary = pipeline.counter.summary()
+    summary['source'] = source
+    if pipeline.motion_gate is not None:
+        summary['motion'] = pipeline.motion_gate.stats()
+    if pipeline.is_live:
+        summary['reconnects'] = pipeline.reconnects
+    if pipeline.resumed_from is not None:
+        summary['resumed_from_frame'] = pipeline.resumed_from
+    if pipeline.profiler.enabled:
+        summary['stages'] = pipeline.profiler.summary()
+    return summary
+
+
+def process_source(source, options, model=None, metrics=None, event_store=None):
+    """Processa um vídeo e retorna o resumo do contador com a origem.
+
+    `metrics` (profiling.MetricsServer) passa a expor as etapas desta fonte;
+    `event_store` (store.EventStore) recebe um evento por veículo contado.
+    """
+    pipeline = build_pipeline(source, options, model, event_store)
+    if metrics is not None:
+        metrics.register(pipeline.profiler, source=source)
+    pipeline.run()
+    return summarize(pipeline, source)
+
+
+def process_streams(sources, options, model=None, metrics=None, event_store=None):
+    """Processa todas as fontes ao mesmo tempo com um único modelo (MultiStreamPipeline).
+
+    Retorna (resumos, falhas) como run_parallel.
+    """
+    from multistream import MultiStreamPipeline
+
+    pipelines = [build_pipeline(source, options, event_store=event_store) for source in sources]
+    if metrics is not None:
+        for pipeline, source in zip(pipelines, sources):
+            metrics.register(pipeline.profiler, source=source)
+    batch_size = max(options.get('batch_size', 1), len(pipelines))
+    engine = MultiStreamPipeline(pipelines, batch_size=batch_size, model=model)
+    counters = engine.run()
+
+    failed = {id(pipeline): error for pipeline, error in engine.failures}
+    summaries = [summarize(p, s) for p, s, c in zip(pipelines, sources, counters)
+                 if c is not None]
+    failures = [(s, failed[id(p)]) for p, s in zip(pipelines, sources) if id(p) in failed]
+    return summaries, failures
+
+
+def _init_worker(torch_threads, backend, precision):
+    global _worker_model
+    from pipeline import load_model
+
+    _worker_model = load_model(backend, precision)
+
+    # Evita que N processos disputem todos os núcleos cada um
+    import torch
+    torch.set_num_threads(torch_threads)
+
+
+def _process_in_worker(source, options, events_db):
+    if events_db is None:
+        return process_source(source, options, model=_worker_model)
+
+    # Um EventStore por vídeo: fechado ao fim dele, nada fica só na fila
+    # quando o processo do pool é encerrado
+    from store import EventStore
+
+    event_store = EventStore(events_db)
+    try:
+        return process_source(source, options, model=_worker_model, event_store=event_store)
+    finally:
+        event_store.close()
+
+
+def run_parallel(sources, options, workers=None, on_result=None, events_db=None):
+    """Distribui os vídeos entre `workers` processos.
+
+    Retorna (resumos, falhas) na ordem de entrada; falhas é uma lista de
+    (origem, mensagem). on_result(resumo) é chamado assim que cada vídeo termina.
+    Com `events_db`, cada processo grava os eventos dos seus vídeos no arquivo.
+    """
+    from pipeline import exported_model_path
+
+    workers = workers or os.cpu_count() or 1
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    backend = options.get('backend', 'torch')
+    precision = options.get('precision', 'fp32')
+    # Exporta uma vez aqui, antes que os processos disputem o mesmo arquivo
+    exported_model_path(backend, precision)
+    # Por posição na entrada: uma fonte repetida não sobrescreve o resultado da outra
+    results = {}
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(torch_threads, backend, precision)) as pool:
+        futures = {pool.submit(_process_in_worker, source, options, events_db): index
+                   for index, source in enumerate(sources)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                failures.append((sources[index], str(e)))
+                continue
+            if on_result:
+                on_result(results[index])
+
+    ordered = [results[i] for i in sorted(results)]
+    return ordered, failures
+
+
+def aggregate_report(summaries, failures=()):
+    """Soma os resultados por vídeo num único relatório."""
+    class_counts = {vtype: 0 for vtype in VEHICLE_TYPES}
+    for summary in summaries:
+        for vtype, count in summary['class_counts'].items():
+            class_counts[vtype] = class_counts.get(vtype, 0) + count
+
+    return {
+        'videos': [
+            {'source': s['source'], 'total': s['total'], 'class_counts': s['class_counts']}
+            for s in summaries
+        ],
+        'total': sum(s['total'] for s in summaries),
+        'class_counts': class_counts,
+        'failures': [{'source': src, 'error': err} for src, err in failures],
+    }
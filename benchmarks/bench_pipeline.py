@@ -0,0 +1,377 @@
+# benchmarks/bench_pipeline.py
+# Benchmark de ponta a ponta reproduzível: gera um vídeo sintético de trânsito
+# (retângulos coloridos com quantidade e classe conhecidas), roda o
+# VehiclePipeline sem interface e mede tempo por etapa, FPS, pico de memória
+# e acerto da contagem. O resultado é salvo em JSON para comparar versões.
+#
+# Uso: python benchmarks/bench_pipeline.py [--detector stub|yolo] [--seconds 30]
+#          [--skip 0] [--batch 1] [--tracker euclidean] [--baseline anterior.json]
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from pipeline import SIMPLE_VEHICLE_MAP, VehiclePipeline, load_model
+from profiling import STAGES
+from store import EventStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Classe YOLO -> (largura, altura, cor BGR). Cores puras e distantes entre si
+# para o detector por cor separar as classes mesmo com a compressão MJPG
+VEHICLE_SPECS = {
+    2: (60, 30, (0, 200, 0)),      # carro
+    3: (30, 18, (200, 0, 0)),      # moto
+    5: (110, 40, (0, 0, 200)),     # ônibus
+    7: (90, 40, (0, 200, 200)),    # caminhão
+}
+CLASS_WEIGHTS = {2: 0.6, 3: 0.2, 5: 0.05, 7: 0.15}
+
+# Faixas: (centro y, velocidade em px/frame, sentido). Velocidade fixa por
+# faixa: um veículo nunca alcança o da frente
+LANES = ((60, 4, 1), (140, 6, 1), (220, 5, -1), (300, 7, -1))
+BACKGROUND = 60
+COLOR_TOLERANCE = 60
+MIN_DETECTION_AREA = 50
+
+
+# ========== VÍDEO SINTÉTICO ==========
+def make_traffic_video(path, seconds=30, fps=30, width=640, height=360, seed=0):
+    """Grava o vídeo e retorna a contagem real por tipo (Carro/Moto/Caminhão).
+
+    Os veículos entram e saem por completo antes do fim, então todo veículo
+    gerado aparece no vídeo e deve ser contado exatamente uma vez.
+    """
+    rng = np.random.default_rng(seed)
+    n_frames = int(seconds * fps)
+    classes = list(CLASS_WEIGHTS)
+    weights = np.array(list(CLASS_WEIGHTS.values()))
+
+    # Agenda (frame de entrada, faixa, classe); para de gerar a tempo de todos saírem
+    longest = max(w for w, _, _ in VEHICLE_SPECS.values())
+    schedule = []
+    for lane, (_, speed, _) in enumerate(LANES):
+        last_exit = n_frames - (width + longest) // speed - 1
+        frame = int(rng.integers(0, fps))
+        while frame < last_exit:
+            cls = int(rng.choice(classes, p=weights / weights.sum()))
+            schedule.append((frame, lane, cls))
+            # Espaço para o veículo entrar inteiro antes do próximo, mais uma folga aleatória
+            frame += (VEHICLE_SPECS[cls][0] + 40) // speed + int(rng.integers(fps // 2, 3 * fps))
+
+    texture = rng.integers(-10, 11, size=(height, width, 3))
+    background = np.clip(BACKGROUND + texture, 0, 255).astype(np.uint8)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Não foi possível gravar {path}")
+    frame_buffer = np.empty_like(background)
+    for index in range(n_frames):
+        np.copyto(frame_buffer, background)
+        for start, lane, cls in schedule:
+            if start > index:
+                continue
+            y, speed, direction = LANES[lane]
+            w, h, color = VEHICLE_SPECS[cls]
+            travelled = (index - start) * speed
+            x = -w + travelled if direction > 0 else width - travelled
+            if x >= width or x + w <= 0:
+                continue
+            cv2.rectangle(frame_buffer, (int(x), y - h // 2), (int(x) + w - 1, y + h // 2),
+                          color, -1)
+        writer.write(frame_buffer)
+    writer.release()
+
+    truth = {}
+    for _, _, cls in schedule:
+        vtype = SIMPLE_VEHICLE_MAP[cls]
+        truth[vtype] = truth.get(vtype, 0) + 1
+    return truth
+
+
+def fixture(seconds, seed, width, height, fps=30):
+    """Vídeo sintético em cache (gerado uma vez por combinação de parâmetros)."""
+    folder = Path(tempfile.gettempdir()) / "vehicle_tracker_bench"
+    folder.mkdir(exist_ok=True)
+    stem = f"traffic_s{seed}_{seconds}s_{width}x{height}_{fps}fps"
+    video, truth_path = folder / f"{stem}.avi", folder / f"{stem}.json"
+    if not video.exists() or not truth_path.exists():
+        truth = make_traffic_video(video, seconds, fps, width, height, seed)
+        truth_path.write_text(json.dumps(truth))
+    return video, json.loads(truth_path.read_text())
+
+
+# ========== DETECTOR DE REFERÊNCIA ==========
+class StubTensor(np.ndarray):
+    """Array com o .cpu().numpy() dos tensores do torch."""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+
+class StubBoxes:
+    """Mesmos atributos de ultralytics Boxes que os rastreadores usam."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy).view(StubTensor)
+        self.conf = np.asarray(conf).view(StubTensor)
+        self.cls = np.asarray(cls).view(StubTensor)
+
+    @property
+    def xywh(self):
+        wh = self.xyxy[:, 2:] - self.xyxy[:, :2]
+        return np.hstack([self.xyxy[:, :2] + wh / 2, wh]).view(StubTensor)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, index):
+        return StubBoxes(self.xyxy[index], self.conf[index], self.cls[index])
+
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class ColorDetector:
+    """Detector determinístico: acha os retângulos pela cor de cada classe.
+
+    Implementa só o model.predict() que o pipeline chama, então mede o custo
+    de todo o resto sem depender de torch/ultralytics.
+    """
+
+    def __init__(self):
+        self._ranges = [
+            (cls, np.clip(np.array(color) - COLOR_TOLERANCE, 0, 255).astype(np.uint8),
+             np.clip(np.array(color) + COLOR_TOLERANCE, 0, 255).astype(np.uint8))
+            for cls, (_, _, color) in VEHICLE_SPECS.items()
+        ]
+
+    def predict(self, images, classes=None, conf=0.25, imgsz=None, verbose=False):
+        return [self._detect(image, classes) for image in images]
+
+    def _detect(self, image, classes):
+        boxes, labels = [], []
+        for cls, low, high in self._ranges:
+            if classes is not None and cls not in classes:
+                continue
+            mask = cv2.inRange(image, low, high)
+            n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            for x, y, w, h, area in stats[1:n]:
+                if area >= MIN_DETECTION_AREA:
+                    boxes.append((x, y, x + w, y + h))
+                    labels.append(cls)
+        xyxy = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        return StubResult(StubBoxes(xyxy, np.full(len(xyxy), 0.9, dtype=np.float32),
+                                    np.array(labels, dtype=np.float32)))
+
+
+# ========== EXECUÇÃO ==========
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def version_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+    }
+
+
+def run_once(video, model, args):
+    event_store = EventStore(args.events_db) if args.events_db else None
+    pipeline = VehiclePipeline(
+        video_path=str(video),
+        frame_skip=args.skip,
+        batch_size=args.batch,
+        prefetch_depth=args.prefetch,
+        tracker=args.tracker,
+        motion_threshold=args.motion_threshold,
+        model=model,
+        event_store=event_store,
+        # Um consumidor vazio faz o pipeline desenhar o overlay, como na interface
+        on_frame=None if args.no_overlay else (lambda frame: None),
+    )
+    start = time.perf_counter()
+    counter = pipeline.run()
+    wall = time.perf_counter() - start
+    if event_store is not None:
+        event_store.close()
+
+    stages = pipeline.profiler.summary()
+    frames = stages.get('counting', {}).get('count', 0)
+    # Com --skip, o vídeo avança mais rápido que os frames processados
+    source_frames = pipeline._sampler.position
+    return {
+        'wall_s': wall,
+        'frames': frames,
+        'fps': frames / wall if wall else 0.0,
+        'source_frames': source_frames,
+        'source_fps': source_frames / wall if wall else 0.0,
+        'stages': stages,
+        'counts': dict(counter.class_counts),
+    }
+
+
+def accuracy(counts, truth):
+    per_class = {}
+    for vtype, expected in truth.items():
+        got = counts.get(vtype, 0)
+        per_class[vtype] = {'expected': expected, 'counted': got,
+                            'error': got - expected}
+    expected_total = sum(truth.values())
+    counted_total = sum(counts.get(vtype, 0) for vtype in truth)
+    return {
+        'per_class': per_class,
+        'expected_total': expected_total,
+        'counted_total': counted_total,
+        # 1.0 = contagem exata; erros por classe se somam em módulo
+        'score': max(0.0, 1 - sum(abs(c['error']) for c in per_class.values()) / expected_total)
+        if expected_total else 1.0,
+    }
+
+
+def compare(result, baseline, max_regression):
+    """Imprime a variação contra um resultado anterior; retorna False se houve regressão."""
+    old, new = baseline['results'], result['results']
+    ok = True
+    change = new['fps'] / old['fps'] - 1 if old['fps'] else 0.0
+    print(f"\nContra {baseline['version'].get('commit') or 'base'}: FPS {old['fps']:.1f} -> "
+          f"{new['fps']:.1f} ({change:+.1%})")
+    if change < -max_regression:
+        print(f"  REGRESSÃO: FPS caiu mais que {max_regression:.0%}")
+        ok = False
+    for stage in STAGES:
+        if stage in old['stages'] and stage in new['stages']:
+            before, after = old['stages'][stage]['mean_ms'], new['stages'][stage]['mean_ms']
+            print(f"  {stage:<11} {before:8.3f} -> {after:8.3f} ms/frame")
+    old_score, new_score = old['accuracy']['score'], new['accuracy']['score']
+    print(f"  acerto      {old_score:8.3f} -> {new_score:8.3f}")
+    if new_score < old_score:
+        print("  REGRESSÃO: a contagem ficou menos precisa")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do pipeline")
+    parser.add_argument("--detector", choices=["stub", "yolo"], default="stub",
+                        help="'stub' acha os retângulos pela cor (sem torch); 'yolo' usa "
+                             "yolov8n.pt e mede a inferência real (a contagem não é "
+                             "significativa em retângulos)")
+    parser.add_argument("--backend", default="torch", help="backend do --detector yolo")
+    parser.add_argument("--video", default=None,
+                        help="vídeo próprio em vez do sintético (sem verificação de contagem)")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", default="640x360", help="resolução do vídeo sintético")
+    parser.add_argument("--skip", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--tracker", default="euclidean",
+                        choices=["botsort", "bytetrack", "euclidean"])
+    parser.add_argument("--motion-threshold", type=float, default=None)
+    parser.add_argument("--no-overlay", action="store_true", help="não desenha as caixas")
+    parser.add_argument("--events-db", default=None,
+                        help="grava os eventos neste SQLite durante a medição")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="execuções; vale a de tempo mediano (padrão: 3)")
+    parser.add_argument("--output", default=None,
+                        help="arquivo JSON (padrão: benchmarks/results/bench_<data>.json)")
+    parser.add_argument("--baseline", default=None,
+                        help="resultado anterior para comparar; sai com código 1 se regredir")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="queda de FPS tolerada contra --baseline (padrão: 0.10)")
+    args = parser.parse_args()
+
+    if args.video:
+        video, truth = Path(args.video), None
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        video, truth = fixture(args.seconds, args.seed, width, height)
+
+    model = ColorDetector() if args.detector == "stub" else load_model(args.backend)
+
+    runs = [run_once(video, model, args) for _ in range(max(1, args.repeat))]
+    median_wall = statistics.median(r['wall_s'] for r in runs)
+    chosen = min(runs, key=lambda r: abs(r['wall_s'] - median_wall))
+    chosen['fps_all_runs'] = [r['fps'] for r in runs]
+    chosen['peak_rss_mb'] = peak_rss_mb()
+    chosen['accuracy'] = accuracy(chosen['counts'], truth) if truth else None
+
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'version': version_info(),
+        'config': config,
+        'video': {'path': str(video), 'ground_truth': truth},
+        'results': chosen,
+    }
+
+    print(f"{chosen['frames']} frames em {chosen['wall_s']:.2f} s -> {chosen['fps']:.1f} FPS "
+          f"(execuções: {', '.join(f'{f:.1f}' for f in chosen['fps_all_runs'])})")
+    print(f"vídeo percorrido a {chosen['source_fps']:.1f} frames/s")
+    print(f"{'etapa':<11} {'ms/frame':>9} {'pior ms':>9} {'total s':>9}")
+    for stage in STAGES:
+        if stage in chosen['stages']:
+            s = chosen['stages'][stage]
+            print(f"{stage:<11} {s['mean_ms']:9.3f} {s['max_ms']:9.3f} {s['total_s']:9.2f}")
+    if chosen['peak_rss_mb'] is not None:
+        print(f"pico de memória: {chosen['peak_rss_mb']:.0f} MB")
+    if chosen['accuracy']:
+        acc = chosen['accuracy']
+        print(f"contagem: {acc['counted_total']} de {acc['expected_total']} "
+              f"(acerto {acc['score']:.3f}) {chosen['counts']}")
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"-> {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not compare(result, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
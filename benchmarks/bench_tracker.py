@@ -0,0 +1,93 @@
+# benchmarks/bench_tracker.py
+# Microbenchmark do EuclideanDistTracker com centenas de objetos simultâneos
+# Compara o laço antigo, a força bruta vetorizada e os índices espaciais (grade, KD-tree)
+#
+# Uso: python benchmarks/bench_tracker.py [--frames 50] [--tracks 10 100 500 2000]
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from tracker import EuclideanDistTracker
+
+
+class LoopTracker:
+    """Implementação anterior (laço duplo guloso), mantida como referência."""
+
+    def __init__(self, max_distance=50, disappear_threshold=10):
+        self.next_id = 0
+        self.tracks = {}
+        self.max_distance = max_distance
+        self.disappear_threshold = disappear_threshold
+
+    def update(self, detections, frame_count):
+        centroids = [(int((x1 + x2) / 2), int((y1 + y2) / 2)) for x1, y1, x2, y2 in detections]
+        assigned = set()
+        for track_id, track in list(self.tracks.items()):
+            min_dist = float('inf')
+            best_idx = -1
+            for i, (cx, cy) in enumerate(centroids):
+                if i in assigned:
+                    continue
+                dist = np.linalg.norm(np.array(track['centroid']) - np.array([cx, cy]))
+                if dist < min_dist and dist <= self.max_distance:
+                    min_dist = dist
+                    best_idx = i
+            if best_idx != -1:
+                assigned.add(best_idx)
+                self.tracks[track_id] = {'centroid': centroids[best_idx], 'last_seen': frame_count}
+        for i, centroid in enumerate(centroids):
+            if i not in assigned:
+                self.tracks[self.next_id] = {'centroid': centroid, 'last_seen': frame_count}
+                self.next_id += 1
+        for track_id in list(self.tracks.keys()):
+            if frame_count - self.tracks[track_id]['last_seen'] > self.disappear_threshold:
+                del self.tracks[track_id]
+        return [(t['centroid'][0], t['centroid'][1], i) for i, t in self.tracks.items()]
+
+
+def make_scene(n_objects, n_frames, seed=0, width=3840, height=2160, box=40, speed=8):
+    """Objetos em movimento retilíneo; retorna a lista de detecções por frame."""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform([0, 0], [width, height], size=(n_objects, 2))
+    velocities = rng.uniform(-speed, speed, size=(n_objects, 2))
+    frames = []
+    for _ in range(n_frames):
+        positions = (positions + velocities) % [width, height]
+        frames.append(np.hstack([positions, positions + box]))
+    return frames
+
+
+def time_tracker(tracker_cls, frames, **kwargs):
+    tracker = tracker_cls(**kwargs)
+    start = time.perf_counter()
+    for frame_count, detections in enumerate(frames):
+        tracker.update(detections, frame_count)
+    return (time.perf_counter() - start) / len(frames) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do EuclideanDistTracker")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--tracks", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--loop-max", type=int, default=500,
+                        help="maior número de tracks medido com o laço antigo (lento)")
+    args = parser.parse_args()
+
+    print("ms por frame")
+    print(f"{'tracks':>8} {'laço antigo':>12} {'força bruta':>12} {'grade':>10} {'kd-tree':>10}")
+    for n in args.tracks:
+        frames = make_scene(n, args.frames)
+        loop = f"{time_tracker(LoopTracker, frames):.2f}" if n <= args.loop_max else "-"
+        brute = time_tracker(EuclideanDistTracker, frames)
+        grid = time_tracker(EuclideanDistTracker, frames, spatial_index='grid')
+        kdtree = time_tracker(EuclideanDistTracker, frames, spatial_index='kdtree')
+        print(f"{n:>8} {loop:>12} {brute:>12.2f} {grid:>10.2f} {kdtree:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# checkpoint.py
+# Progresso salvo de vídeos longos: posição, rastreador e contador em disco,
+# para retomar de onde parou após uma parada ou queda
+
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+
+# Muda quando o formato do estado salvo muda; checkpoints antigos são recusados
+CHECKPOINT_VERSION = 3
+
+
+def checkpoints_dir():
+    # Ao lado do .exe ou do script, como o modelo e as regiões
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent / "checkpoints"
+    return Path(__file__).parent / "checkpoints"
+
+
+def checkpoint_path(source, directory=None):
+    """Arquivo de checkpoint da fonte: nome do vídeo + hash do caminho completo."""
+    source = str(source)
+    digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:10]
+    return Path(directory or checkpoints_dir()) / f"{Path(source).stem}-{digest}.ckpt"
+
+
+def save_checkpoint(path, state):
+    """Grava num arquivo temporário e troca: uma queda no meio não corrompe o anterior."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = pickle.dumps({'version': CHECKPOINT_VERSION, **state},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def load_checkpoint(path):
+    """Estado salvo, ou None se não houver checkpoint para o arquivo."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {path.name} é de outra versão do programa")
+    return state
+
+
+def remove_checkpoint(path):
+    Path(path).unlink(missing_ok=True)
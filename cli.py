@@ -0,0 +1,252 @@
+# cli.py
+# Execução sem interface gráfica: processa vídeos e grava contagens em JSON/CSV
+#
+# Uso:
+#   python cli.py video1.mp4 video2.mp4 --skip 2 --format csv --output-dir resultados
+#   python cli.py gravacoes/ --workers 4
+#   python cli.py "https://www.youtube.com/watch?v=..." --target-fps 5
+
+import argparse
+import csv
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Conta veículos únicos em vídeos sem abrir a interface gráfica."
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="arquivos de vídeo, pastas com vídeos ou links do YouTube")
+    parser.add_argument("--skip", type=int, default=2,
+                        help="frames pulados entre inferências (padrão: 2)")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="processa N frames por segundo de vídeo (ignora --skip)")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="frames por lote de inferência em arquivos locais (padrão: 1)")
+    parser.add_argument("--prefetch", type=int, default=4,
+                        help="frames decodificados antecipadamente (padrão: 4)")
+    parser.add_argument("--tracker", choices=["botsort", "bytetrack", "euclidean"],
+                        default="botsort",
+                        help="backend de rastreamento; 'euclidean' é o mais leve (padrão: botsort)")
+    parser.add_argument("--id-expiry", type=float, default=None,
+                        help="esquece IDs não vistos há N segundos (padrão: 600 em streams)")
+    parser.add_argument("--roi", default=None,
+                        help='polígono "x1,y1; x2,y2; x3,y3; ..." onde a inferência roda '
+                             '(padrão: região salva para a fonte)')
+    parser.add_argument("--line", default=None,
+                        help='linha de contagem "x1,y1; x2,y2"; só conta quem a cruza')
+    parser.add_argument("--adaptive", action="store_true",
+                        help="ajusta imgsz e salto automaticamente para manter --target-rtf")
+    parser.add_argument("--target-rtf", type=float, default=1.0,
+                        help="segundos de vídeo por segundo de processamento (padrão: 1.0)")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="pula o YOLO quando menos que esta fração dos pixels muda "
+                             "(ex.: 0.002); desligado por padrão")
+    parser.add_argument("--backend", choices=["torch", "onnx", "openvino"], default="torch",
+                        help="backend de inferência; onnx/openvino exportam o modelo na "
+                             "primeira vez e reaproveitam o arquivo (padrão: torch)")
+    parser.add_argument("--precision", choices=["fp32", "fp16", "int8"], default="fp32",
+                        help="precisão dos pesos; fp16/int8 só com --backend openvino "
+                             "(padrão: fp32)")
+    parser.add_argument("--stream-height", type=int, default=480,
+                        help="altura máxima do formato pedido ao YouTube; usa o menor "
+                             "formato suficiente (padrão: 480)")
+    parser.add_argument("--max-reconnects", type=int, default=None,
+                        help="tentativas seguidas de reconexão de um stream ao vivo "
+                             "(padrão: sem limite)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos em paralelo, um modelo por processo (padrão: 1)")
+    parser.add_argument("--multi-stream", action="store_true",
+                        help="processa todas as fontes ao mesmo tempo, com um modelo "
+                             "compartilhado em lotes por rodízio (ex.: várias câmeras)")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="salva o progresso de cada arquivo nesta pasta a cada "
+                             "--checkpoint-interval segundos e ao interromper (Ctrl+C)")
+    parser.add_argument("--checkpoint-interval", type=float, default=30.0,
+                        help="segundos entre checkpoints (padrão: 30)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continua os arquivos a partir do checkpoint salvo "
+                             "(pasta padrão: checkpoints/ ao lado do programa)")
+    parser.add_argument("--events-db", default=None,
+                        help="grava cada veículo contado (hora, posição, ID, classe, caixa) "
+                             "neste SQLite; consulte o fluxo por hora com store.py")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="expõe latências por etapa e filas no formato do Prometheus "
+                             "em http://127.0.0.1:N/metrics durante o processamento")
+    parser.add_argument("--format", choices=["json", "csv"], default="json",
+                        help="formato de saída (padrão: json)")
+    parser.add_argument("--output-dir", default=".",
+                        help="pasta onde os resultados são gravados (padrão: atual)")
+    return parser.parse_args(argv)
+
+
+def output_stem(source):
+    if source.startswith(("http://", "https://")):
+        return re.sub(r"\W+", "_", source.split("//", 1)[1]).strip("_")[-60:]
+    return Path(source).stem
+
+
+def write_json(data, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def write_timeline_csv(summary, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["serie", "tempo_s", "acumulado"])
+        for series, points in summary['timeline'].items():
+            for t, c in points:
+                writer.writerow([series, f"{t:.3f}", c])
+
+
+def write_report_csv(report, path):
+    vehicle_types = list(report['class_counts'])
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["origem", "total"] + vehicle_types)
+        for video in report['videos']:
+            writer.writerow([video['source'], video['total']] +
+                            [video['class_counts'].get(v, 0) for v in vehicle_types])
+        writer.writerow(["TOTAL", report['total']] +
+                        [report['class_counts'][v] for v in vehicle_types])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+
+    # Imports adiados para que --help não pague o custo de OpenCV/NumPy
+    from batch import (aggregate_report, expand_inputs, process_source, process_streams,
+                       run_parallel)
+    from checkpoint import checkpoints_dir
+    from pipeline import INFERENCE_BACKENDS
+    from region import parse_points
+
+    if args.precision not in INFERENCE_BACKENDS[args.backend]:
+        supported = ", ".join(INFERENCE_BACKENDS[args.backend])
+        print(f"Erro: --backend {args.backend} aceita apenas --precision {supported}",
+              file=sys.stderr)
+        return 2
+
+    if args.multi_stream and args.adaptive:
+        print("Erro: --adaptive não pode ser usado com --multi-stream", file=sys.stderr)
+        return 2
+
+    sources = expand_inputs(args.inputs)
+    multi_stream = args.multi_stream and len(sources) > 1
+    parallel = not multi_stream and args.workers > 1 and len(sources) > 1
+
+    metrics = None
+    if args.metrics_port is not None:
+        if parallel:
+            print("Aviso: --metrics-port não acompanha os processos de --workers; "
+                  "as métricas ficam só no resumo de cada vídeo", file=sys.stderr)
+        else:
+            from profiling import MetricsServer
+            metrics = MetricsServer(args.metrics_port).start()
+            print(f"Métricas em http://127.0.0.1:{metrics.port}/metrics")
+
+    event_store = None
+    try:
+        # Em paralelo, cada processo abre o próprio EventStore (ver batch.run_parallel)
+        if args.events_db and not parallel:
+            from store import EventStore
+            event_store = EventStore(args.events_db)
+
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        options = {
+            'frame_skip': args.skip,
+            'target_fps': args.target_fps,
+            'prefetch_depth': args.prefetch,
+            'batch_size': args.batch,
+            'tracker': args.tracker,
+            'id_expiry': args.id_expiry,
+            'roi': parse_points(args.roi) if args.roi else None,
+            'counting_line': parse_points(args.line) if args.line else None,
+            'adaptive': args.adaptive,
+            'target_rtf': args.target_rtf,
+            'motion_threshold': args.motion_threshold,
+            'backend': args.backend,
+            'precision': args.precision,
+            'stream_height': args.stream_height,
+            'max_reconnects': args.max_reconnects,
+            'checkpoint_dir': args.checkpoint_dir or (checkpoints_dir() if args.resume else None),
+            'checkpoint_interval': args.checkpoint_interval,
+            'resume': args.resume,
+        }
+
+        def save(summary):
+            path = output_dir / f"{output_stem(summary['source'])}.{args.format}"
+            if args.format == "json":
+                write_json(summary, path)
+            else:
+                write_timeline_csv(summary, path)
+
+            counts = ", ".join(f"{k}: {v}" for k, v in summary['class_counts'].items())
+            print(f"{summary['source']}: {summary['total']} veículos ({counts}) -> {path}")
+            if 'resumed_from_frame' in summary:
+                print(f"  retomado do checkpoint no frame {summary['resumed_from_frame']}")
+            if 'motion' in summary:
+                motion = summary['motion']
+                print(f"  inferências evitadas sem movimento: {motion['skipped']} de "
+                      f"{motion['checked']} frames ({motion['skipped_ratio']:.0%})")
+
+        if multi_stream:
+            try:
+                summaries, failures = process_streams(sources, options, metrics=metrics,
+                                                      event_store=event_store)
+            except ValueError as e:
+                summaries, failures = [], [(source, str(e)) for source in sources]
+            for summary in summaries:
+                save(summary)
+        elif parallel:
+            summaries, failures = run_parallel(sources, options, workers=args.workers,
+                                               on_result=save, events_db=args.events_db)
+        else:
+            summaries, failures = [], []
+            for source in sources:
+                try:
+                    summary = process_source(source, options, metrics=metrics,
+                                             event_store=event_store)
+                except Exception as e:
+                    failures.append((source, str(e)))
+                    continue
+                save(summary)
+                summaries.append(summary)
+
+        for source, error in failures:
+            print(f"Erro ao processar {source}: {error}", file=sys.stderr)
+
+        if len(sources) > 1:
+            report = aggregate_report(summaries, failures)
+            report_path = output_dir / f"relatorio.{args.format}"
+            if args.format == "json":
+                write_json(report, report_path)
+            else:
+                write_report_csv(report, report_path)
+            print(f"Relatório: {report['total']} veículos em {len(summaries)} vídeo(s) -> {report_path}")
+
+        return 1 if failures else 0
+    finally:
+        # Também no Ctrl+C: os eventos ainda na fila já entraram no checkpoint
+        # salvo em _close() e não seriam gravados de novo numa retomada
+        if metrics is not None:
+            metrics.stop()
+        if event_store is not None:
+            event_store.close()
+            print(f"Eventos: {event_store.written} gravados em {event_store.path}")
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        # Os pipelines já salvaram o checkpoint ao sair (com --checkpoint-dir/--resume)
+        print("Interrompido.", file=sys.stderr)
+        sys.exit(130)
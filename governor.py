@@ -0,0 +1,76 @@
+# governor.py
+# Governador adaptativo: ajusta a resolução de inferência (imgsz) e o salto de
+# frames para manter um fator de tempo real alvo em streams ao vivo
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resoluções de inferência, da mais precisa para a mais barata
+IMGSZ_LEVELS = (640, 512, 416, 320)
+
+
+class AdaptiveGovernor:
+    """Observa o FPS medido e a fila de frames e troca qualidade por velocidade.
+
+    Fator de tempo real (RTF) = segundos de vídeo processados por segundo
+    de relógio = fps_processado * (salto + 1) / fps_do_vídeo. Abaixo do alvo
+    (ou com frames sendo descartados) reduz primeiro o imgsz e depois aumenta
+    o salto; com folga (RTF acima do alvo ou inferência ociosa esperando
+    frames) desfaz na ordem inversa. Cada ajuste é registrado no log.
+    """
+
+    def __init__(self, video_fps, target_rtf=1.0, base_skip=0, max_skip=10,
+                 adjust_skip=True, tolerance=0.1, idle_threshold=0.3, cooldown=3.0):
+        self.video_fps = video_fps if video_fps and video_fps > 0 else 30.0
+        self.target_rtf = target_rtf
+        self.base_skip = base_skip
+        self.max_skip = max_skip if adjust_skip else base_skip
+        self.tolerance = tolerance
+        self.idle_threshold = idle_threshold
+        self.cooldown = cooldown
+        self.level = 0
+        self.skip = base_skip
+        self.adjustments = 0
+        self._last_change = None
+
+    @property
+    def imgsz(self):
+        return IMGSZ_LEVELS[self.level]
+
+    def rtf(self, processed_fps):
+        return processed_fps * (self.skip + 1) / self.video_fps
+
+    def observe(self, processed_fps, now, backlog=0, dropped=0, idle_fraction=0.0):
+        """Recebe as medições do último intervalo; retorna True se algo mudou."""
+        if self._last_change is not None and now - self._last_change < self.cooldown:
+            return False
+
+        rtf = self.rtf(processed_fps)
+        behind = rtf < self.target_rtf * (1 - self.tolerance) or dropped > 0
+        headroom = (rtf > self.target_rtf * (1 + self.tolerance) or
+                    (idle_fraction > self.idle_threshold and backlog == 0))
+
+        previous = (self.imgsz, self.skip)
+        if behind:
+            if self.level < len(IMGSZ_LEVELS) - 1:
+                self.level += 1
+            elif self.skip < self.max_skip:
+                self.skip += 1
+        elif headroom:
+            if self.skip > self.base_skip:
+                self.skip -= 1
+            elif self.level > 0:
+                self.level -= 1
+
+        if (self.imgsz, self.skip) == previous:
+            return False
+
+        self._last_change = now
+        self.adjustments += 1
+        logger.info(
+            "Governador: imgsz %d -> %d, salto %d -> %d (RTF %.2f, alvo %.2f, fila %d, "
+            "descartados %d, ociosidade %.0f%%)",
+            previous[0], self.imgsz, previous[1], self.skip, rtf, self.target_rtf,
+            backlog, dropped, idle_fraction * 100)
+        return True
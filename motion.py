@@ -0,0 +1,98 @@
+# motion.py
+# Filtro de movimento barato à frente da inferência: frames sem mudança
+# reaproveitam as detecções anteriores em vez de passar pelo YOLO
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Diferença de frames em baixa resolução.
+
+    Cada frame é reduzido para `width` pixels de largura, convertido para
+    cinza e suavizado; é comparado com o último frame que passou pela
+    inferência (não com o anterior, para que um movimento lento acumule até
+    ser notado). A fração de pixels que mudaram mais que `pixel_delta` é
+    medida em células de `cell` pixels, do tamanho de um veículo pequeno, e
+    não no frame inteiro: uma moto mudaria poucos pixels perto da cena toda.
+    Se nenhuma célula passar de `threshold` e nada mudar dentro das caixas
+    `boxes` (os veículos detectados por último), a cena é considerada
+    parada. Depois de `max_skipped` frames parados seguidos a inferência
+    roda mesmo assim.
+    """
+
+    def __init__(self, threshold=0.002, pixel_delta=25, width=160, max_skipped=30, cell=8):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.cell = cell
+        self.max_skipped = max_skipped
+        self._reference = None
+        self._small = None
+        self._gray = None
+        self._streak = 0
+        self.checked = 0
+        self.skipped = 0
+
+    def _downscale(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        if self._small is None or self._small.shape[:2] != size[::-1]:
+            self._small = np.empty((size[1], size[0]) + frame.shape[2:], dtype=frame.dtype)
+            self._gray = np.empty(size[::-1], dtype=np.uint8)
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if self._small.ndim == 3:
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        else:
+            self._gray[...] = self._small
+        return cv2.GaussianBlur(self._gray, (5, 5), 0)
+
+    def is_static(self, frame, boxes=None):
+        """True se a inferência pode ser pulada e as detecções anteriores reaproveitadas.
+
+        `boxes`: xyxy dos veículos detectados, nas coordenadas de `frame`.
+        """
+        self.checked += 1
+        gray = self._downscale(frame)
+
+        if (self._reference is not None and self._reference.shape == gray.shape
+                and self._streak < self.max_skipped):
+            changed = cv2.absdiff(gray, self._reference) > self.pixel_delta
+            if (self._busiest_cell(changed) < self.threshold
+                    and not self._changed_inside(changed, boxes, frame.shape[1])):
+                self._streak += 1
+                self.skipped += 1
+                return True
+
+        self._reference = gray
+        self._streak = 0
+        return False
+
+    def _busiest_cell(self, changed):
+        """Maior fração de pixels alterados entre as células da grade."""
+        height, width = changed.shape
+        size = (max(1, width // self.cell), max(1, height // self.cell))
+        # INTER_AREA sobre a máscara 0/1 dá a média de cada célula
+        fractions = cv2.resize(changed.astype(np.float32), size, interpolation=cv2.INTER_AREA)
+        return float(fractions.max())
+
+    def _changed_inside(self, changed, boxes, frame_width):
+        if boxes is None or len(boxes) == 0:
+            return False
+        scale = self.width / frame_width
+        height, width = changed.shape
+        # Arredonda para fora: uma caixa pequena ainda cobre ao menos um pixel
+        corners = np.asarray(boxes, dtype=np.float64) * scale
+        x1 = np.clip(np.floor(corners[:, 0]), 0, width).astype(np.int64)
+        y1 = np.clip(np.floor(corners[:, 1]), 0, height).astype(np.int64)
+        x2 = np.clip(np.ceil(corners[:, 2]), 0, width).astype(np.int64)
+        y2 = np.clip(np.ceil(corners[:, 3]), 0, height).astype(np.int64)
+        return any(changed[top:bottom, left:right].any()
+                   for left, top, right, bottom in zip(x1, y1, x2, y2))
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skipped_ratio': self.skipped / self.checked if self.checked else 0.0,
+        }
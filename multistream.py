@@ -0,0 +1,142 @@
+# multistream.py
+# Várias fontes ao mesmo tempo: cada uma decodifica na própria thread e um
+# único motor de inferência monta lotes com frames de todas, em rodízio
+
+import threading
+import time
+
+from governor import IMGSZ_LEVELS
+from pipeline import YOLO_CLASSES_TO_TRACK, load_model
+
+
+class MultiStreamPipeline:
+    """Compartilha um modelo entre vários VehiclePipeline (um por câmera).
+
+    Cada pipeline mantém seu rastreador, UniqueVehicleCounter, ROI, linha e
+    callbacks; só a inferência é conjunta. A cada lote o escalonador pega no
+    máximo um frame por fonte em cada rodada, começando por uma fonte
+    diferente a cada vez, então uma câmera com mais FPS não atrasa as outras:
+    o excesso dela espera no próprio anel (ao vivo, os mais antigos são
+    descartados). O governador adaptativo não se aplica, pois o imgsz é um
+    só para o lote inteiro.
+    """
+
+    def __init__(self, pipelines, batch_size=None, model=None):
+        if not pipelines:
+            raise ValueError("Nenhuma fonte informada")
+        if len({p.tracker for p in pipelines}) > 1:
+            raise ValueError("Todas as fontes precisam usar o mesmo rastreador")
+        if any(p.adaptive for p in pipelines):
+            raise ValueError("O governador adaptativo não funciona com várias fontes")
+        self.pipelines = list(pipelines)
+        self.batch_size = batch_size or len(self.pipelines)
+        self.model = model
+        self.failures = []
+        self._ready = threading.Event()
+        self._is_running = True
+        self._next = 0
+
+    def run(self):
+        """Processa até todas as fontes terminarem ou stop().
+
+        Retorna os contadores na ordem das fontes (None para as que não
+        abriram; o motivo fica em `failures` como (pipeline, mensagem)).
+        """
+        first = self.pipelines[0]
+        model = self.model if self.model is not None else load_model(first.backend,
+                                                                     first.precision)
+        active = []
+        for pipeline in self.pipelines:
+            try:
+                pipeline._open(hold=self.batch_size, ready_event=self._ready)
+            except Exception as e:
+                self.failures.append((pipeline, str(e)))
+                continue
+            active.append(pipeline)
+        if not active:
+            raise ValueError("Nenhuma fonte pôde ser aberta")
+
+        opened = list(active)
+        try:
+            if active[0]._tracker.tracks_in_model:
+                raise ValueError("O rastreador desta versão do ultralytics não funciona com várias fontes")
+            self._run_loop(model, active)
+        finally:
+            for pipeline in opened:
+                pipeline._close()
+
+        return [p.counter if p in opened else None for p in self.pipelines]
+
+    def stop(self):
+        self._is_running = False
+        for pipeline in self.pipelines:
+            pipeline.stop()
+        self._ready.set()
+
+    def _run_loop(self, model, active):
+        conf = active[0]._tracker.conf
+        while self._is_running and active:
+            # Limpa antes de consultar: um frame que chegar depois acorda o wait
+            self._ready.clear()
+            batch = self._collect(active)
+            active = [p for p in active if p._is_running and not p._prefetcher.exhausted]
+            if not batch:
+                if active:
+                    self._ready.wait(0.1)
+                continue
+
+            try:
+                self._infer(model, conf, batch)
+            finally:
+                for pipeline, (slot, _, _) in batch:
+                    pipeline._prefetcher.release(slot)
+
+    def _collect(self, active):
+        """Até batch_size frames prontos, um por fonte a cada rodada."""
+        start = self._next % len(active)
+        self._next += 1
+        order = active[start:] + active[:start]
+
+        batch = []
+        progress = True
+        while progress and len(batch) < self.batch_size:
+            progress = False
+            for pipeline in order:
+                if len(batch) >= self.batch_size:
+                    break
+                item = pipeline._prefetcher.get_nowait()
+                if item is not None:
+                    batch.append((pipeline, item))
+                    progress = True
+        return batch
+
+    def _infer(self, model, conf, batch):
+        # Agrupa por fonte mantendo a ordem dos frames de cada uma
+        groups = {}
+        for pipeline, item in batch:
+            groups.setdefault(pipeline, []).append(item)
+
+        prepared = []
+        images = []
+        for pipeline, items in groups.items():
+            frames, pipeline_images, moving = pipeline._prepare_batch(items)
+            indices = [index for _, _, index in items]
+            prepared.append((pipeline, frames, indices, pipeline_images, moving, len(images)))
+            images.extend(pipeline_images[i] for i in moving)
+
+        predicted = []
+        if images:
+            stage_start = time.perf_counter()
+            predicted = model.predict(images, classes=YOLO_CLASSES_TO_TRACK, conf=conf,
+                                      imgsz=IMGSZ_LEVELS[0], verbose=False)
+            elapsed = time.perf_counter() - stage_start
+
+        for pipeline, frames, indices, pipeline_images, moving, offset in prepared:
+            if moving:
+                # Cada fonte fica com a parte do lote proporcional aos seus frames
+                pipeline.profiler.add('inference', elapsed * len(moving) / len(images),
+                                      len(moving))
+            results = [None] * len(pipeline_images)
+            for k, i in enumerate(moving):
+                results[i] = predicted[offset + k]
+            pipeline._finish_batch(frames, pipeline_images, results, indices)
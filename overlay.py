@@ -0,0 +1,83 @@
+# overlay.py
+# Desenho das caixas, IDs e classes sobre o frame: os tracks viram NumPy uma
+# vez por frame e as caixas de uma mesma classe saem em poucas chamadas do OpenCV
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.6
+TEXT_THICKNESS = 2
+BOX_THICKNESS = 3
+TEXT_COLOR = (255, 255, 255)
+
+# (x1, y1), (x2, y1), (x2, y2), (x1, y2) a partir das colunas de xyxy
+OUTLINE_CORNERS = [0, 1, 2, 1, 2, 3, 0, 3]
+
+
+class OverlayRenderer:
+    """Desenha os tracks (xyxy, ids, classes) sobre uma imagem.
+
+    `names` e `colors` mapeiam a classe do YOLO para o rótulo e a cor BGR.
+    Contornos e fundos dos rótulos de todas as caixas de uma classe saem em
+    uma chamada de polylines e uma de fillPoly; só o texto continua sendo
+    um putText por caixa. Na fonte Hershey todos os dígitos têm a mesma
+    largura, então o tamanho do rótulo fica em cache por (classe, dígitos do ID).
+
+    Com `scale`, as caixas são convertidas para uma imagem redimensionada
+    (ex.: a área de exibição); fonte e espessuras não mudam, então o rótulo
+    tem o mesmo tamanho na tela qualquer que seja a resolução do vídeo.
+    """
+
+    def __init__(self, names, colors, default_name='Veículo', default_color=(0, 150, 255)):
+        self.names = names
+        self.colors = colors
+        self.default_name = default_name
+        self.default_color = default_color
+        self._label_sizes = {}
+
+    def _label_size(self, name, digits):
+        size = self._label_sizes.get((name, digits))
+        if size is None:
+            text = f"ID {'0' * digits} - {name}"
+            size = cv2.getTextSize(text, FONT, FONT_SCALE, TEXT_THICKNESS)[0]
+            self._label_sizes[(name, digits)] = size
+        return size
+
+    def draw(self, image, tracks, scale=1.0):
+        if tracks is None or len(tracks[1]) == 0:
+            return
+        boxes = np.asarray(tracks[0], dtype=np.float32)
+        if scale != 1.0:
+            boxes = boxes * scale
+        boxes = boxes.astype(np.int32)
+        ids = np.asarray(tracks[1]).astype(np.int64).tolist()
+        classes = np.asarray(tracks[2]).astype(np.int64).tolist()
+
+        names = [self.names.get(cls_id, self.default_name) for cls_id in classes]
+        labels = [f"ID {track_id} - {name}" for track_id, name in zip(ids, names)]
+        sizes = np.array([self._label_size(name, len(str(track_id)))
+                          for track_id, name in zip(ids, names)], dtype=np.int32)
+
+        left, top = boxes[:, 0], boxes[:, 1]
+        right = left + sizes[:, 0]
+        label_top = top - sizes[:, 1] - 10
+        outlines = boxes[:, OUTLINE_CORNERS].reshape(-1, 4, 2)
+        backgrounds = np.stack([left, label_top, right, label_top,
+                                right, top, left, top], axis=1).reshape(-1, 4, 2)
+
+        groups = {}
+        for row, cls_id in enumerate(classes):
+            groups.setdefault(cls_id, []).append(row)
+        for cls_id, rows in groups.items():
+            color = self.colors.get(cls_id, self.default_color)
+            if len(groups) > 1:
+                cv2.polylines(image, outlines[rows], True, color, BOX_THICKNESS)
+                cv2.fillPoly(image, backgrounds[rows], color)
+            else:
+                cv2.polylines(image, outlines, True, color, BOX_THICKNESS)
+                cv2.fillPoly(image, backgrounds, color)
+
+        # Texto por último, para nenhum fundo de rótulo cobrir o de outra caixa
+        for label, x, y in zip(labels, left.tolist(), top.tolist()):
+            cv2.putText(image, label, (x, y - 5), FONT, FONT_SCALE, TEXT_COLOR, TEXT_THICKNESS)
@@ -0,0 +1,1076 @@
+# pipeline.py
+# Pipeline de decodificação → rastreamento → contagem, sem dependência de GUI
+# Usado pela interface (app_pyside.py) e pela linha de comando (cli.py)
+
+import logging
+import pickle
+import shutil
+import sys
+import time
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from checkpoint import load_checkpoint, remove_checkpoint, save_checkpoint
+from governor import IMGSZ_LEVELS, AdaptiveGovernor
+from motion import MotionGate
+from overlay import OverlayRenderer
+from profiling import StageProfiler
+from region import CountingLine, RegionOfInterest
+from stream import ReconnectingCapture
+from tracker import create_tracker
+
+logger = logging.getLogger(__name__)
+
+# ========== CONFIGURAÇÕES ==========
+VEHICLE_CLASSES = {
+    2: 'Carro',
+    3: 'Moto',
+    5: 'Ônibus',
+    7: 'Caminhão'
+}
+
+SIMPLE_VEHICLE_MAP = {
+    2: 'Carro',
+    3: 'Moto',
+    5: 'Caminhão',
+    7: 'Caminhão'
+}
+
+YOLO_CLASSES_TO_TRACK = [2, 3, 5, 7]
+
+# Cores BGR das caixas no overlay
+OVERLAY_COLORS = {
+    2: (0, 255, 0),
+    3: (255, 100, 0),
+    5: (0, 150, 255),
+    7: (0, 150, 255)
+}
+
+# 'full' desenha no frame original, 'display' deixa o desenho para quem exibe
+# (na imagem já reduzida, via draw_overlay) e 'off' não desenha nada
+OVERLAY_MODES = ('full', 'display', 'off')
+
+# Streams ao vivo esquecem IDs não vistos há 10 minutos (o total continua exato)
+LIVE_ID_EXPIRY_SECONDS = 600
+
+# Arquivos locais só testam seek em saltos a partir deste tamanho; abaixo dele
+# o grab() frame a frame sempre ganhou nas medições (MJPG, MPEG-4 e VP9)
+SEEK_MIN_GAP = 8
+
+# ========== CONTADOR POR ID ÚNICO ==========
+class CumulativeTimeline:
+    """Série acumulada (tempo, total) em arrays NumPy que dobram de tamanho.
+
+    Eventos dentro da mesma janela de `bucket_seconds` são somados ao último
+    ponto, então o tamanho cresce com a duração e não com o tráfego. O
+    acumulado é mantido a cada add(), sem recalcular cumsum nas consultas.
+    """
+
+    def __init__(self, bucket_seconds=1.0, capacity=1024):
+        self.bucket_seconds = bucket_seconds
+        self.total = 0
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._counts = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        self._last_bucket = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._times.nbytes + self._counts.nbytes
+
+    def add(self, t, count):
+        self.total += count
+        bucket = int(t // self.bucket_seconds) if self.bucket_seconds > 0 else None
+
+        if self._size and bucket is not None and bucket == self._last_bucket:
+            self._times[self._size - 1] = t
+            self._counts[self._size - 1] = self.total
+            return
+
+        if self._size == len(self._times):
+            self._times = np.resize(self._times, 2 * self._size)
+            self._counts = np.resize(self._counts, 2 * self._size)
+        self._times[self._size] = t
+        self._counts[self._size] = self.total
+        self._size += 1
+        self._last_bucket = bucket
+
+    def since(self, index):
+        """Cópia dos pontos a partir de `index` (para envio incremental)."""
+        return self._times[index:self._size].copy(), self._counts[index:self._size].copy()
+
+    def data(self, max_points=None):
+        """Retorna (tempos, acumulados); com max_points, uma amostra uniforme que mantém o último ponto."""
+        n = self._size
+        if max_points is None or n <= max_points:
+            return self._times[:n], self._counts[:n]
+        step = -(-n // max_points)
+        idx = np.arange(0, n, step)
+        if idx[-1] != n - 1:
+            idx = np.append(idx, n - 1)
+        return self._times[idx], self._counts[idx]
+
+
+class IdRegistry:
+    """IDs já contados, do avistado há mais tempo ao mais recente.
+
+    Com expiry_seconds, IDs que não aparecem há mais que essa janela são
+    esquecidos, mantendo a memória limitada em streams contínuos. Os
+    rastreadores nunca reutilizam IDs, então o total de únicos (mantido
+    pelo contador) continua exato.
+    """
+
+    def __init__(self, expiry_seconds=None):
+        self.expiry_seconds = expiry_seconds
+        self.expired = 0
+        self._last_seen = OrderedDict()
+
+    def __contains__(self, vid):
+        return vid in self._last_seen
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def touch(self, ids, now):
+        """Atualiza o último avistamento dos IDs e retorna os que eram inéditos."""
+        last_seen = self._last_seen
+        new_ids = []
+        for vid in ids:
+            if vid in last_seen:
+                last_seen.move_to_end(vid)
+            else:
+                new_ids.append(vid)
+            last_seen[vid] = now
+        self._expire(now)
+        return new_ids
+
+    def _expire(self, now):
+        if self.expiry_seconds is None:
+            return
+        limit = now - self.expiry_seconds
+        last_seen = self._last_seen
+        while last_seen:
+            oldest = next(iter(last_seen))
+            if last_seen[oldest] >= limit:
+                break
+            del last_seen[oldest]
+            self.expired += 1
+
+    def memory_bytes(self):
+        # Estrutura do OrderedDict mais os objetos int (ID) e float (horário) de cada entrada
+        return sys.getsizeof(self._last_seen) + len(self._last_seen) * (28 + 24)
+
+
+class UniqueVehicleCounter:
+    def __init__(self, bucket_seconds=1.0, id_expiry=None):
+        self.seen_ids = IdRegistry(id_expiry)
+        self.total_unique = 0
+        self.start_time = None
+        self.timeline = CumulativeTimeline(bucket_seconds)
+        self.class_counts = {'Carro': 0, 'Moto': 0, 'Caminhão': 0}
+        self.class_timeline = {vtype: CumulativeTimeline(bucket_seconds)
+                               for vtype in self.class_counts}
+        # IDs inéditos da última chamada de add_new_ids e o horário dela
+        self.last_new_ids = []
+        self.last_time = None
+
+    def add_new_ids(self, current_ids, class_info=None):
+        current_time = time.time()
+        new_ids = self.seen_ids.touch(current_ids, current_time)
+        self.last_new_ids = new_ids
+        self.last_time = current_time
+
+        if new_ids:
+            self.total_unique += len(new_ids)
+            new_per_class = {}
+            for vid in new_ids:
+                vehicle_type = class_info.get(vid) if class_info else None
+                if vehicle_type in self.class_counts:
+                    self.class_counts[vehicle_type] += 1
+                    new_per_class[vehicle_type] = new_per_class.get(vehicle_type, 0) + 1
+
+            if self.start_time is None:
+                self.start_time = current_time
+            elapsed = current_time - self.start_time
+            self.timeline.add(elapsed, len(new_ids))
+            for vehicle_type, count in new_per_class.items():
+                self.class_timeline[vehicle_type].add(elapsed, count)
+
+        return len(new_ids), self.total_unique
+
+    def memory_usage(self):
+        """Bytes ocupados pelo registro de IDs e pelas timelines."""
+        timelines = [self.timeline, *self.class_timeline.values()]
+        return {
+            'ids_tracked': len(self.seen_ids),
+            'ids_expired': self.seen_ids.expired,
+            'registry_bytes': self.seen_ids.memory_bytes(),
+            'timeline_bytes': sum(t.nbytes for t in timelines),
+        }
+
+    def get_cumulative_data(self, max_points=None):
+        return self.timeline.data(max_points)
+
+    def get_class_cumulative_data(self, vehicle_type, max_points=None):
+        if vehicle_type not in self.class_timeline:
+            return [], []
+        return self.class_timeline[vehicle_type].data(max_points)
+
+    def summary(self):
+        """Totais e timelines acumuladas em tipos nativos (serializáveis em JSON)."""
+        times, counts = self.get_cumulative_data()
+        timeline = {'Total': [[float(t), int(c)] for t, c in zip(times, counts)]}
+        for vtype in self.class_counts:
+            t, c = self.get_class_cumulative_data(vtype)
+            timeline[vtype] = [[float(ti), int(ci)] for ti, ci in zip(t, c)]
+
+        return {
+            'total': self.total_unique,
+            'class_counts': dict(self.class_counts),
+            'timeline': timeline,
+            'memory': self.memory_usage(),
+        }
+
+# ========== FUNÇÕES AUXILIARES ==========
+# Backends de inferência: nome -> precisões aceitas. ONNX Runtime em CPU só
+# roda fp32 (o ultralytics ignora half=True na exportação para CPU)
+INFERENCE_BACKENDS = {
+    'torch': ('fp32',),
+    'onnx': ('fp32',),
+    'openvino': ('fp32', 'fp16', 'int8'),
+}
+
+MODEL_NAME = "yolov8n"
+
+
+def model_dirs():
+    """(pasta do .pt, pasta onde os modelos exportados ficam em cache)."""
+    # Detecta se está rodando como .exe ou .py
+    if getattr(sys, 'frozen', False):
+        # Rodando como .exe - PyInstaller extrai em _MEIPASS, que é temporária;
+        # o cache fica ao lado do executável para sobreviver entre execuções
+        return Path(sys._MEIPASS), Path(sys.executable).parent
+    # Rodando como .py normal
+    base_path = Path(__file__).parent
+    return base_path, base_path
+
+
+def exported_model_path(backend='torch', precision='fp32'):
+    """Caminho do modelo para o backend, exportando-o na primeira vez."""
+    if precision not in INFERENCE_BACKENDS.get(backend, ()):
+        raise ValueError(f"Combinação de backend/precisão não suportada: {backend}/{precision}")
+
+    base_path, cache_path = model_dirs()
+    pt_path = base_path / f"{MODEL_NAME}.pt"
+    if backend == 'torch':
+        return pt_path
+
+    # O nome precisa terminar como o ultralytics espera para reconhecer o formato
+    if backend == 'onnx':
+        target = cache_path / f"{MODEL_NAME}_{precision}.onnx"
+    else:
+        target = cache_path / f"{MODEL_NAME}_{precision}_openvino_model"
+    if target.exists():
+        return target
+
+    from ultralytics import YOLO
+
+    print(f"Exportando {pt_path.name} para {backend} ({precision}), feito uma única vez...")
+    # dynamic=True mantém lotes e imgsz variáveis (governador adaptativo)
+    exported = YOLO(str(pt_path)).export(format=backend, dynamic=True,
+                                         half=precision == 'fp16', int8=precision == 'int8')
+    shutil.move(str(exported), str(target))
+    return target
+
+
+def warmup_model(model, imgsz=640):
+    """Roda uma inferência descartável para a primeira do vídeo não pagar a inicialização."""
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+
+
+# Modelos já carregados neste processo, por caminho do arquivo: reiniciar o
+# processamento reaproveita o modelo (e o aquecimento) em vez de ler do disco
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+
+
+def load_model(backend='torch', precision='fp32', warmup=True):
+    # Import adiado: ultralytics/torch só carregam quando a inferência começa
+    from ultralytics import YOLO
+
+    path = str(exported_model_path(backend, precision))
+    with _model_cache_lock:
+        model = _model_cache.get(path)
+        if model is None:
+            model = YOLO(path, task='detect')
+            if warmup:
+                warmup_model(model)
+            _model_cache[path] = model
+    return model
+
+
+# URLs de stream resolvidas: (youtube_url, altura) -> (stream_url, expira_em). As URLs do
+# YouTube expiram (parâmetro expire=), então o TTL nunca passa desse prazo
+STREAM_URL_TTL = 30 * 60
+# Altura máxima do formato escolhido no YouTube: a inferência roda em 640 px,
+# então resoluções maiores só custam banda e decodificação
+STREAM_MAX_HEIGHT = 480
+_STREAM_URL_MARGIN = 60
+_stream_url_cache = {}
+_stream_url_cache_lock = threading.Lock()
+
+
+def _stream_url_expiry(stream_url, now):
+    expiry = now + STREAM_URL_TTL
+    query = parse_qs(urlparse(stream_url).query)
+    if 'expire' in query:
+        try:
+            expiry = min(expiry, float(query['expire'][0]) - _STREAM_URL_MARGIN)
+        except ValueError:
+            pass
+    return expiry
+
+
+def invalidate_stream_url(url):
+    """Descarta a URL de stream em cache (ex.: ela não abriu mais)."""
+    with _stream_url_cache_lock:
+        for key in [key for key in _stream_url_cache if key[0] == url]:
+            del _stream_url_cache[key]
+
+
+def get_youtube_stream_url(url, use_cache=True, max_height=STREAM_MAX_HEIGHT):
+    """URL de stream do YouTube, reaproveitando a última resolvida enquanto válida."""
+    key = (url, max_height)
+    now = time.time()
+    if use_cache:
+        with _stream_url_cache_lock:
+            cached = _stream_url_cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+    stream_url = _extract_youtube_stream_url(url, max_height)
+    if stream_url:
+        with _stream_url_cache_lock:
+            _stream_url_cache[key] = (stream_url, _stream_url_expiry(stream_url, now))
+    return stream_url
+
+
+def _extract_youtube_stream_url(url, max_height=STREAM_MAX_HEIGHT):
+    """Obtém URL de stream direto do YouTube - CORRIGIDO"""
+    import yt_dlp
+
+    ydl_opts = {
+        # Menor formato suficiente: o melhor até max_height ou, se não houver,
+        # o menor acima dele. Em lives é a playlist HLS da variante escolhida
+        'format': f'best[height<={max_height}]/worst[height>{max_height}]/best',
+        'quiet': True,
+        'no_warnings': True,
+        'nocheckcertificate': True,
+        'geo_bypass': True,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+    }
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if 'url' in info:
+                return info['url']
+            elif 'manifest_url' in info:
+                return info['manifest_url']
+            elif 'formats' in info and len(info['formats']) > 0:
+                return info['formats'][0]['url']
+            else:
+                print("Erro: Nenhuma URL de stream encontrada")
+                return None
+    except Exception as e:
+        print(f"Erro ao obter stream: {e}")
+        return None
+
+
+# ========== LEITURA DE FRAMES ==========
+class FrameSampler:
+    """Lê apenas os frames que serão processados.
+
+    Os frames descartados são avançados com grab(): o FFmpeg ainda os
+    decodifica, e a economia é só o retrieve() (cópia e conversão para BGR).
+    Em arquivos locais, saltos de SEEK_MIN_GAP frames ou mais podem usar
+    seek: o sampler mede o tempo de um grab() e de um seek no próprio vídeo
+    e só faz seek quando ele sai mais barato que os grab() do salto. O seek
+    do FFmpeg tem custo fixo alto (volta ao keyframe e descarta o decoder),
+    então na prática compensa a partir de uns 20 frames. Com target_fps
+    definido, amostra N frames por segundo de vídeo em vez de usar um salto
+    fixo.
+    """
+
+    def __init__(self, cap, frame_skip=0, target_fps=None, seekable=False):
+        self.cap = cap
+        self.frame_skip = frame_skip
+        self.seekable = seekable
+        self.position = 0       # frames já consumidos do vídeo
+        self.frame_index = -1   # índice do último frame decodificado
+        self.grab_seconds = None  # média móvel de um grab()
+        self.seek_seconds = None  # média móvel de um seek; None = ainda não testado
+        self.seeks = 0
+
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        if target_fps and video_fps > 0:
+            self.step = max(1.0, video_fps / target_fps)
+        else:
+            self.step = None
+        self._next_target = 0.0
+
+    def _next_gap(self):
+        if self.step is None:
+            return self.frame_skip
+        target = int(round(self._next_target))
+        self._next_target += self.step
+        return max(0, target - self.position)
+
+    @staticmethod
+    def _average(current, sample):
+        return sample if current is None else 0.8 * current + 0.2 * sample
+
+    def _should_seek(self, gap):
+        if not self.seekable or gap < SEEK_MIN_GAP or self.grab_seconds is None:
+            return False
+        # Primeiro salto longo: um seek para medir quanto ele custa neste vídeo
+        return self.seek_seconds is None or self.seek_seconds < gap * self.grab_seconds
+
+    def _seek(self, gap):
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.position + gap):
+            # Sem suporte a seek: não tenta de novo
+            self.seekable = False
+            return False
+        self.position += gap
+        self.seeks += 1
+        return True
+
+    def _skip(self, gap):
+        for _ in range(gap):
+            if not self.cap.grab():
+                return False
+            self.position += 1
+        return True
+
+    def seek_after(self, frame_index):
+        """Continua a leitura como se `frame_index` tivesse acabado de ser processado."""
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index + 1):
+            return False
+        self.position = frame_index + 1
+        self.frame_index = frame_index
+        if self.step is not None:
+            # Próximo alvo do modo por tempo depois de frame_index
+            n = int(frame_index / self.step) + 1
+            while round(n * self.step) <= frame_index:
+                n += 1
+            self._next_target = n * self.step
+        return True
+
+    def read(self, out=None):
+        """Decodifica o próximo frame amostrado; `out` permite reutilizar um buffer."""
+        gap = self._next_gap()
+        start = time.perf_counter()
+        seek = self._should_seek(gap) and self._seek(gap)
+        if not seek and not self._skip(gap):
+            return False, None
+        if not self.cap.grab():
+            return False, None
+        elapsed = time.perf_counter() - start
+        if seek:
+            # O grab() logo depois do seek recomeça o decoder e entra no custo;
+            # desconta o grab() que o frame amostrado custaria de qualquer jeito
+            self.seek_seconds = self._average(self.seek_seconds, elapsed - self.grab_seconds)
+        elif gap > 0:
+            self.grab_seconds = self._average(self.grab_seconds, elapsed / (gap + 1))
+        ret, frame = self.cap.retrieve(out)
+        self.frame_index = self.position
+        self.position += 1
+        return ret, frame
+
+
+class FramePrefetcher:
+    """Decodifica frames numa thread produtora para um anel de buffers reutilizados.
+
+    Até `depth` frames ficam prontos à frente da inferência. Com o anel cheio,
+    a produtora espera (arquivos) ou descarta o frame mais antigo
+    (drop_oldest=True, streams ao vivo) para manter a latência limitada.
+    A consumidora deve devolver cada slot com release() após processá-lo e
+    pode segurar até `hold` slots ao mesmo tempo (lotes de inferência).
+    `ready_event`, se passado, é sinalizado a cada frame pronto (e no fim),
+    para uma consumidora que atende vários prefetchers com get_nowait().
+    Com `profiler`, o tempo de cada decodificação entra na etapa 'decode'.
+    """
+
+    def __init__(self, sampler, depth=4, drop_oldest=False, hold=1, ready_event=None,
+                 profiler=None):
+        self.sampler = sampler
+        self.depth = max(1, depth)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.wait_time = 0.0  # tempo total da consumidora esperando frames
+        # Slots extras: os segurados pela consumidora e um sendo decodificado
+        self._buffers = [None] * (self.depth + hold + 1)
+        self._free = deque(range(len(self._buffers)))
+        self._ready = deque()
+        self._cond = threading.Condition()
+        self._finished = False
+        self._stopped = False
+        self._ready_event = ready_event
+        self._profiler = profiler
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _produce(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._stopped and len(self._ready) >= self.depth and not self.drop_oldest:
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    if len(self._ready) >= self.depth:
+                        old_slot, _ = self._ready.popleft()
+                        self._free.append(old_slot)
+                        self.dropped += 1
+                    slot = self._free.popleft()
+
+                # A decodificação acontece fora do lock
+                decode_start = time.perf_counter()
+                ret, frame = self.sampler.read(out=self._buffers[slot])
+                if ret and self._profiler is not None:
+                    self._profiler.add('decode', time.perf_counter() - decode_start)
+
+                with self._cond:
+                    if not ret:
+                        self._free.append(slot)
+                        return
+                    self._buffers[slot] = frame
+                    self._ready.append((slot, self.sampler.frame_index))
+                    self._cond.notify_all()
+                if self._ready_event is not None:
+                    self._ready_event.set()
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+            if self._ready_event is not None:
+                self._ready_event.set()
+
+    def get(self):
+        """Retorna (slot, frame, índice) ou None quando o vídeo terminou ou após cancel()."""
+        with self._cond:
+            if not self._ready and not self._finished and not self._stopped:
+                wait_start = time.monotonic()
+                while not self._ready and not self._finished and not self._stopped:
+                    self._cond.wait()
+                self.wait_time += time.monotonic() - wait_start
+            if self._stopped or not self._ready:
+                return None
+            slot, frame_index = self._ready.popleft()
+            self._cond.notify_all()
+            return slot, self._buffers[slot], frame_index
+
+    def get_nowait(self):
+        """Como get(), mas retorna None na hora se não houver frame pronto."""
+        with self._cond:
+            if not self._ready:
+                return None
+            slot, frame_index = self._ready.popleft()
+            self._cond.notify_all()
+            return slot, self._buffers[slot], frame_index
+
+    @property
+    def exhausted(self):
+        """True quando o vídeo terminou e todos os frames já foram entregues."""
+        with self._cond:
+            return self._finished and not self._ready
+
+    @property
+    def backlog(self):
+        """Frames decodificados aguardando a inferência."""
+        return len(self._ready)
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Sinaliza a parada sem esperar: a produtora sai e get() retorna None."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stop(self):
+        self.cancel()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+# ========== PIPELINE ==========
+class VehiclePipeline:
+    """Processa um vídeo (arquivo ou YouTube) e conta veículos únicos.
+
+    `tracker` escolhe o backend de rastreamento (ver tracker.TRACKER_BACKENDS).
+    `id_expiry` (segundos) limita a memória do registro de IDs; streams ao
+    vivo usam LIVE_ID_EXPIRY_SECONDS por padrão. Um modelo já carregado pode
+    ser passado em `model` (ex.: um por processo no processamento em lote).
+    `roi` (polígono [(x, y), ...]) restringe a inferência ao seu retângulo
+    envolvente, com o resto mascarado; com `counting_line` ([(x, y), (x, y)])
+    só contam os tracks que cruzam a linha. Com `adaptive`, um
+    AdaptiveGovernor ajusta imgsz e salto de frames para manter `target_rtf`.
+    `motion_threshold` (fração de pixels alterados) liga o MotionGate: frames
+    sem movimento reaproveitam as detecções anteriores sem rodar o YOLO.
+    Streams ao vivo usam o menor formato até `stream_height` e reconectam
+    sozinhos se caírem (até `max_reconnects` tentativas seguidas; None =
+    sem limite), sem perder rastreador nem contagens.
+    `backend`/`precision` escolhem como o modelo é carregado quando `model`
+    não é passado (ver INFERENCE_BACKENDS). `overlay` é um de OVERLAY_MODES
+    e pode ser trocado durante a execução. Com `event_store`
+    (store.EventStore), cada veículo contado é gravado como um evento.
+    Em arquivos locais, `checkpoint_path` salva a cada `checkpoint_interval`
+    segundos (e ao parar) a posição, o rastreador, o contador e a linha de
+    contagem; com `resume`, a execução continua do checkpoint existente. O
+    checkpoint é apagado quando o vídeo termina.
+
+    Os callbacks são opcionais e chamados na thread que executa run():
+    on_frame(frame) recebe o frame (anotado no modo 'full'), que pertence ao
+    anel de buffers (copie-o se precisar mantê-lo); os tracks dele ficam em
+    `current_tracks` durante a chamada; on_stats(total, novos);
+    on_distribution(contagens_por_tipo); on_fps(fps); e, a cada 2 segundos e
+    ao terminar, on_graph(séries) com apenas os pontos novos de cada curva:
+    séries mapeia 'Total' e cada tipo para (índice_inicial, tempos,
+    acumulados). O primeiro ponto reenviado substitui o último já recebido
+    (ele pode ter sido atualizado pelo agrupamento por intervalo). Com `profile` (padrão), o
+    `profiler` mede cada etapa; on_metrics({'stages': ..., 'gauges': ...})
+    recebe os percentis e as filas uma vez por segundo.
+    """
+
+    def __init__(self, video_path=None, youtube_url=None, frame_skip=0, target_fps=None,
+                 prefetch_depth=4, batch_size=1, tracker='botsort', id_expiry=None,
+                 roi=None, counting_line=None, adaptive=False, target_rtf=1.0,
+                 motion_threshold=None, backend='torch', precision='fp32',
+                 stream_height=STREAM_MAX_HEIGHT, max_reconnects=None, profile=True,
+                 overlay='full', event_store=None, checkpoint_path=None, resume=False,
+                 checkpoint_interval=30.0, model=None, on_frame=None, on_stats=None, on_distribution=None, on_fps=None,
+                 on_graph=None, on_metrics=None):
+        self.video_path = video_path
+        self.youtube_url = youtube_url
+        self.frame_skip = frame_skip
+        self.target_fps = target_fps
+        self.prefetch_depth = prefetch_depth
+        self.batch_size = batch_size
+        self.tracker = tracker
+        self.roi = roi
+        self.counting_line = counting_line
+        self.adaptive = adaptive
+        self.target_rtf = target_rtf
+        self.motion_threshold = motion_threshold
+        self.backend = backend
+        self.precision = precision
+        self.stream_height = stream_height
+        self.max_reconnects = max_reconnects
+        if overlay not in OVERLAY_MODES:
+            raise ValueError(f"Modo de overlay desconhecido: {overlay}")
+        self.overlay = overlay
+        self.event_store = event_store
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        self.resumed_from = None
+        self.model = model
+        self.on_frame = on_frame
+        self.on_stats = on_stats
+        self.on_distribution = on_distribution
+        self.on_fps = on_fps
+        self.on_graph = on_graph
+        self.on_metrics = on_metrics
+        if id_expiry is None and youtube_url:
+            id_expiry = LIVE_ID_EXPIRY_SECONDS
+        self.counter = UniqueVehicleCounter(id_expiry=id_expiry)
+        self.profiler = StageProfiler(enabled=profile)
+        self.current_tracks = None
+        self.frame_index = -1
+        self._renderer = OverlayRenderer(VEHICLE_CLASSES, OVERLAY_COLORS)
+        self._governor = None
+        self.motion_gate = None
+        self._cap = None
+        self._prefetcher = None
+        self._is_running = True
+
+    @property
+    def is_live(self):
+        return bool(self.youtube_url)
+
+    @property
+    def reconnects(self):
+        """Reconexões feitas pelo stream ao vivo nesta execução."""
+        return getattr(getattr(self, '_cap', None), 'reconnects', 0)
+
+    def run(self):
+        """Executa até o fim do vídeo ou até stop(); retorna o contador."""
+        model = self.model if self.model is not None else load_model(self.backend, self.precision)
+        # Lotes só fazem sentido offline; streams ao vivo priorizam latência
+        batch_size = 1 if self.is_live else self.batch_size
+        self._open(hold=batch_size)
+        try:
+            self._run_loop(model, batch_size)
+        finally:
+            self._close()
+
+        return self.counter
+
+    def stop(self):
+        """Pede a parada; pode ser chamado de outra thread e não espera run() terminar."""
+        self._is_running = False
+        # Interrompe uma reconexão em espera e acorda o laço parado em get()
+        if isinstance(self._cap, ReconnectingCapture):
+            self._cap.cancel()
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+
+    def _open(self, hold=1, ready_event=None):
+        """Abre a fonte e inicia a decodificação; `hold` = frames segurados por lote."""
+        if not self.youtube_url and not self.video_path:
+            raise ValueError("Caminho de vídeo inválido")
+
+        self._roi = RegionOfInterest(self.roi) if self.roi else None
+        self._line = CountingLine(self.counting_line) if self.counting_line else None
+        self.motion_gate = (MotionGate(self.motion_threshold)
+                            if self.motion_threshold is not None else None)
+
+        if self.youtube_url:
+            cap = ReconnectingCapture(self._resolve_stream, max_retries=self.max_reconnects)
+            if not cap.open():
+                raise ValueError("Não foi possível obter stream do YouTube")
+        else:
+            cap = cv2.VideoCapture(self.video_path)
+
+        if not cap.isOpened():
+            raise ValueError("Não foi possível abrir o vídeo")
+        self._video_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        self.last_graph_update = time.time()
+        self._graph_sent = {}
+        self.last_fps_update = time.time()
+        self.fps_counter = 0
+
+        sampler = FrameSampler(cap, frame_skip=self.frame_skip, target_fps=self.target_fps,
+                               seekable=not self.is_live)
+        try:
+            self._tracker = create_tracker(self.tracker)
+            self._last_result = None
+            self._gate_boxes = None
+            self._checkpoint = self.checkpoint_path if not self.is_live else None
+            if self._checkpoint is not None:
+                if self.resume:
+                    # Antes de a produtora começar a ler: o seek precisa vir primeiro
+                    self._restore_checkpoint(sampler)
+                self._next_checkpoint = time.monotonic() + self.checkpoint_interval
+        except Exception:
+            # _close() não roda se _open() falhar
+            cap.release()
+            raise
+
+        prefetcher = FramePrefetcher(sampler, depth=max(self.prefetch_depth, hold),
+                                     drop_oldest=self.is_live, hold=hold,
+                                     ready_event=ready_event, profiler=self.profiler)
+        prefetcher.start()
+        self._cap = cap
+        self._sampler = sampler
+        self._prefetcher = prefetcher
+
+        self._governor = None
+        if self.adaptive:
+            # No modo por tempo o salto é definido pelo alvo; só o imgsz se ajusta
+            time_based = sampler.step is not None
+            base_skip = round(sampler.step) - 1 if time_based else self.frame_skip
+            self._governor = AdaptiveGovernor(cap.get(cv2.CAP_PROP_FPS), self.target_rtf,
+                                              base_skip=base_skip, adjust_skip=not time_based)
+            self._last_wait_time = 0.0
+            self._last_dropped = 0
+
+    def _close(self):
+        if isinstance(self._cap, ReconnectingCapture):
+            # Interrompe uma reconexão em espera para a produtora poder terminar
+            self._cap.cancel()
+        if self.on_graph:
+            # Os pontos dos últimos 2 s ainda não foram enviados
+            self._emit_graph()
+        if self._checkpoint is not None:
+            if self._is_running and self._prefetcher.exhausted:
+                remove_checkpoint(self._checkpoint)
+            else:
+                self._save_checkpoint()
+        self._prefetcher.stop()
+        self._cap.release()
+
+    # ========== CHECKPOINTS ==========
+    def _save_checkpoint(self):
+        if self.frame_index < 0:
+            return
+        state = {
+            'source': self.video_path,
+            'tracker_name': self.tracker,
+            'frame_index': self.frame_index,
+            'saved_at': time.time(),
+            'tracker': self._tracker,
+            'counter': self.counter,
+            'line': self._line,
+        }
+        try:
+            save_checkpoint(self._checkpoint, state)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            # Ex.: rastreador com ReID carregado ("Can't pickle local object");
+            # o processamento segue sem checkpoint
+            logger.warning("Não foi possível salvar o checkpoint %s: %s", self._checkpoint, e)
+            self._checkpoint = None
+
+    def _restore_checkpoint(self, sampler):
+        state = load_checkpoint(self._checkpoint)
+        if state is None:
+            return
+        if state['source'] != self.video_path or state['tracker_name'] != self.tracker:
+            raise ValueError("O checkpoint é de outro vídeo ou rastreador; "
+                             "apague-o ou processe do início")
+        if not sampler.seek_after(state['frame_index']):
+            raise ValueError("Não foi possível posicionar o vídeo no checkpoint")
+
+        self._tracker = state['tracker']
+        self.counter = state['counter']
+        # A linha guarda de que lado cada track estava; esse estado só vale para
+        # a mesma linha. Sem linha agora, não há o que restaurar
+        saved_line = state['line']
+        if self._line is not None and saved_line is not None:
+            if (np.array_equal(saved_line.a, self._line.a)
+                    and np.array_equal(saved_line.b, self._line.b)):
+                self._line = saved_line
+            else:
+                logger.info("A linha de contagem mudou desde o checkpoint; "
+                            "os cruzamentos recomeçam na linha nova")
+        # As timelines continuam sem o intervalo em que o programa esteve parado
+        if self.counter.start_time is not None:
+            self.counter.start_time += time.time() - state['saved_at']
+        self.frame_index = state['frame_index']
+        self.resumed_from = state['frame_index'] + 1
+        logger.info("Retomando %s do frame %d (%d veículos já contados)",
+                    self.video_path, self.resumed_from, self.counter.total_unique)
+
+    def _resolve_stream(self, fresh=False):
+        # fresh: a URL em cache pode ter expirado antes do previsto
+        if fresh:
+            invalidate_stream_url(self.youtube_url)
+        return get_youtube_stream_url(self.youtube_url, max_height=self.stream_height)
+
+    def _run_loop(self, model, batch_size):
+        """Detecta até N frames de uma vez e alimenta o rastreador na ordem dos frames.
+
+        Com batch_size=1 equivale a model.track(persist=True) por frame; em lote
+        o rastreador vê exatamente a mesma sequência, então as contagens únicas
+        não mudam.
+        """
+        prefetcher = self._prefetcher
+        finished = False
+
+        while self._is_running and not finished:
+            batch = []
+            while len(batch) < batch_size:
+                item = prefetcher.get()
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            try:
+                frames, images, moving = self._prepare_batch(batch)
+                # Frames parados não passam pelo YOLO (result None)
+                results = [None] * len(images)
+                if moving:
+                    # imgsz sempre explícito: o modelo em cache guarda o da última execução
+                    imgsz = self._governor.imgsz if self._governor is not None else IMGSZ_LEVELS[0]
+                    stage_start = time.perf_counter()
+                    predicted = self._tracker.detect(model, [images[i] for i in moving],
+                                                     classes=YOLO_CLASSES_TO_TRACK,
+                                                     conf=self._tracker.conf, imgsz=imgsz,
+                                                     verbose=False)
+                    self.profiler.add('inference', time.perf_counter() - stage_start, len(moving))
+                    for i, result in zip(moving, predicted):
+                        results[i] = result
+                self._finish_batch(frames, images, results, [index for _, _, index in batch])
+            finally:
+                for slot, _, _ in batch:
+                    prefetcher.release(slot)
+
+    def _prepare_batch(self, batch):
+        """(frames, imagens para o modelo, índices das que precisam de inferência)."""
+        stage_start = time.perf_counter()
+        frames = [frame for _, frame, _ in batch]
+        # Com ROI, detecção e rastreamento trabalham no recorte mascarado
+        images = frames
+        if self._roi is not None:
+            images = [self._roi.prepare(frame, i) for i, frame in enumerate(frames)]
+        # O gate olha também dentro das caixas detectadas, nas coordenadas da imagem
+        moving = [i for i, image in enumerate(images)
+                  if self.motion_gate is None
+                  or not self.motion_gate.is_static(image, self._gate_boxes)]
+        self.profiler.add('preprocess', time.perf_counter() - stage_start, len(frames))
+        return frames, images, moving
+
+    def _finish_batch(self, frames, images, results, indices):
+        """Rastreia e conta os frames na ordem; result None reaproveita as últimas detecções."""
+        for frame, image, result, frame_index in zip(frames, images, results, indices):
+            if not self._is_running:
+                break
+            if result is None:
+                # Cena parada: o rastreador recebe as detecções da última inferência,
+                # para que o filtro de Kalman e a idade dos tracks avancem a cada frame
+                result = self._last_result
+            tracks = None
+            if result is not None:
+                stage_start = time.perf_counter()
+                tracks = self._tracker.update(result, image)
+                if tracks is not None and self._roi is not None:
+                    xyxy, ids, classes = tracks
+                    tracks = (xyxy + np.tile(self._roi.offset, 2), ids, classes)
+                self.profiler.add('tracking', time.perf_counter() - stage_start)
+                if result is not self._last_result:
+                    self._last_result = result
+                    if self.motion_gate is not None:
+                        # Detecções, não tracks: um track novo só sai no frame seguinte
+                        self._gate_boxes = result.boxes.xyxy.cpu().numpy()
+            self.frame_index = frame_index
+            self._handle_tracked_frame(frame, tracks)
+
+    def _handle_tracked_frame(self, frame, tracks):
+        counter = self.counter
+        profiler = self.profiler
+        current_ids = set()
+        class_info = {}
+
+        stage_start = time.perf_counter()
+        if tracks is not None:
+            for obj_id, cls_id in zip(tracks[1], tracks[2]):
+                track_id = int(obj_id)
+                current_ids.add(track_id)
+                class_info[track_id] = SIMPLE_VEHICLE_MAP.get(int(cls_id))
+
+        if self._line is not None:
+            # Só conta quem cruza a linha; IDs trocados no meio da cena não recontam
+            if tracks is not None:
+                centroids = (tracks[0][:, :2] + tracks[0][:, 2:]) / 2
+                current_ids = self._line.update([int(i) for i in tracks[1]], centroids)
+            else:
+                current_ids = self._line.update([], [])
+
+        new_count, total_unique = counter.add_new_ids(current_ids, class_info)
+        distribution = counter.class_counts.copy()
+        if new_count and self.event_store is not None:
+            self._record_events(counter.last_new_ids, class_info, tracks)
+        profiler.add('counting', time.perf_counter() - stage_start)
+
+        if self._checkpoint is not None and time.monotonic() >= self._next_checkpoint:
+            self._save_checkpoint()
+            self._next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+        # Sem ninguém assistindo, não há por que desenhar
+        if self.on_frame is not None and self.overlay == 'full':
+            stage_start = time.perf_counter()
+            self.draw_overlay(frame, tracks)
+            profiler.add('overlay', time.perf_counter() - stage_start)
+
+        self.fps_counter += 1
+        if time.time() - self.last_fps_update > 1.0:
+            interval = time.time() - self.last_fps_update
+            fps = self.fps_counter / interval
+            if self.on_fps:
+                self.on_fps(fps)
+            if self._governor is not None:
+                self._govern(fps, interval)
+            self._update_gauges(fps)
+            self.fps_counter = 0
+            self.last_fps_update = time.time()
+
+        if self.on_frame:
+            self.current_tracks = tracks
+            self.on_frame(frame)
+        if self.on_stats:
+            self.on_stats(total_unique, new_count)
+        if self.on_distribution:
+            self.on_distribution(distribution)
+
+        if self.on_graph and time.time() - self.last_graph_update > 2.0:
+            self._emit_graph()
+
+    def _emit_graph(self):
+        """Envia a on_graph os pontos de cada curva ainda não enviados."""
+        counter = self.counter
+        series = {}
+        timelines = {'Total': counter.timeline, **counter.class_timeline}
+        for name, timeline in timelines.items():
+            # Reenvia o último ponto enviado, que pode ter mudado
+            start = max(0, self._graph_sent.get(name, 0) - 1)
+            if len(timeline) > start:
+                series[name] = (start, *timeline.since(start))
+                self._graph_sent[name] = len(timeline)
+
+        if series:
+            self.on_graph(series)
+        self.last_graph_update = time.time()
+
+    def _record_events(self, new_ids, class_info, tracks):
+        """Enfileira um evento por veículo novo; a gravação é da thread do EventStore."""
+        source = self.youtube_url or self.video_path
+        position = self.frame_index / self._video_fps if self._video_fps else None
+        boxes = {}
+        if tracks is not None:
+            boxes = dict(zip(np.asarray(tracks[1]).astype(np.int64).tolist(),
+                             np.asarray(tracks[0], dtype=np.float64).tolist()))
+        no_box = (None, None, None, None)
+        self.event_store.record([
+            (self.counter.last_time, source, position, vid, class_info.get(vid),
+             *boxes.get(vid, no_box))
+            for vid in new_ids
+        ])
+
+    def draw_overlay(self, image, tracks, scale=1.0):
+        """Caixas, ROI e linha sobre `image`; `scale` converte do frame original para ela."""
+        self._renderer.draw(image, tracks, scale)
+        if self._roi is not None:
+            self._roi.draw(image, scale)
+        if self._line is not None:
+            self._line.draw(image, scale)
+
+    def _update_gauges(self, fps):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return
+        profiler.set_gauge('processing_fps', fps)
+        profiler.set_gauge('prefetch_queue_depth', self._prefetcher.backlog)
+        profiler.set_gauge('frames_dropped', self._prefetcher.dropped)
+        profiler.set_gauge('unique_vehicles', self.counter.total_unique)
+        if self.on_metrics:
+            self.on_metrics({'stages': profiler.summary(), 'gauges': profiler.gauges()})
+
+    def _govern(self, fps, interval):
+        prefetcher = self._prefetcher
+        idle = (prefetcher.wait_time - self._last_wait_time) / interval
+        dropped = prefetcher.dropped - self._last_dropped
+        self._last_wait_time = prefetcher.wait_time
+        self._last_dropped = prefetcher.dropped
+
+        if self._governor.observe(fps, time.monotonic(), backlog=prefetcher.backlog,
+                                  dropped=dropped, idle_fraction=idle):
+            self._sampler.frame_skip = self._governor.skip
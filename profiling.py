@@ -0,0 +1,176 @@
+# profiling.py
+# Tempo gasto em cada etapa do pipeline (decodificação, inferência, rastreamento...),
+# profundidade das filas e exportação no formato texto do Prometheus
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Etapas na ordem em que um frame passa por elas; 'display' é o redimensionamento
+# e a entrega à interface (thread do worker) e 'gui' a pintura na thread do Qt
+STAGES = ('decode', 'preprocess', 'inference', 'tracking', 'counting', 'overlay',
+          'display', 'gui')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageProfiler:
+    """Acumula duração total, número de medições e pior caso por etapa.
+
+    Guarda também as últimas `window` medições de cada etapa para os
+    percentis p50/p95/p99 móveis, e valores instantâneos (set_gauge), como
+    a profundidade das filas. add() é chamado de threads diferentes (a
+    decodificação roda na produtora), por isso o lock; com enabled=False
+    vira um retorno imediato e pode ser ligado/desligado durante a execução.
+    """
+
+    def __init__(self, window=1000, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._samples = {}
+        self._gauges = {}
+
+    def add(self, stage, seconds, count=1):
+        """Registra `seconds` gastos em `count` frames (lotes contam todos os frames)."""
+        if not self.enabled:
+            return
+        per_frame = seconds / count if count else seconds
+        with self._lock:
+            entry = self._totals.get(stage)
+            if entry is None:
+                entry = self._totals[stage] = [0.0, 0, 0.0]
+                # Anel de amostras: [buffer, próxima posição, preenchidas]
+                self._samples[stage] = [np.zeros(self.window), 0, 0]
+            entry[0] += seconds
+            entry[1] += count
+            entry[2] = max(entry[2], per_frame)
+
+            ring = self._samples[stage]
+            ring[0][ring[1]] = per_frame
+            ring[1] = (ring[1] + 1) % self.window
+            ring[2] = min(ring[2] + 1, self.window)
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            self._gauges[name] = value
+
+    def gauges(self):
+        return dict(self._gauges)
+
+    def summary(self):
+        """{etapa: {'total_s', 'count', 'mean_ms', 'max_ms', 'p50_ms', 'p95_ms', 'p99_ms'}}."""
+        with self._lock:
+            snapshot = {}
+            for stage, entry in self._totals.items():
+                buffer, _, filled = self._samples[stage]
+                snapshot[stage] = (list(entry), buffer[:filled].copy())
+
+        result = {}
+        for stage in sorted(snapshot, key=_stage_order):
+            (total, count, worst), samples = snapshot[stage]
+            stats = {
+                'total_s': total,
+                'count': count,
+                'mean_ms': total / count * 1000 if count else 0.0,
+                'max_ms': worst * 1000,
+            }
+            percentiles = np.percentile(samples, [q * 100 for q in QUANTILES]) * 1000
+            for q, value in zip(QUANTILES, percentiles):
+                stats[f'p{int(q * 100)}_ms'] = float(value)
+            result[stage] = stats
+        return result
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+# ========== PROMETHEUS ==========
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text(sources):
+    """Formato texto do Prometheus para [(rótulos, profiler), ...]."""
+    lines = [
+        "# HELP vehicle_stage_latency_seconds Latência por frame de cada etapa (janela móvel)",
+        "# TYPE vehicle_stage_latency_seconds summary",
+    ]
+    gauges = []
+    for labels, profiler in sources:
+        for stage, stats in profiler.summary().items():
+            stage_labels = {**labels, 'stage': stage}
+            for q in QUANTILES:
+                value = stats[f'p{int(q * 100)}_ms'] / 1000
+                lines.append(f"vehicle_stage_latency_seconds"
+                             f"{_labels({**stage_labels, 'quantile': q})} {value:.6g}")
+            lines.append(f"vehicle_stage_latency_seconds_sum{_labels(stage_labels)} "
+                         f"{stats['total_s']:.6g}")
+            lines.append(f"vehicle_stage_latency_seconds_count{_labels(stage_labels)} "
+                         f"{stats['count']}")
+        gauges.extend((name, labels, value) for name, value in profiler.gauges().items())
+
+    for name in sorted({name for name, _, _ in gauges}):
+        lines.append(f"# TYPE vehicle_{name} gauge")
+        for gauge_name, labels, value in gauges:
+            if gauge_name == name:
+                lines.append(f"vehicle_{name}{_labels(labels)} {value:.6g}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Endpoint HTTP local (GET /metrics) para execuções sem interface.
+
+    Cada pipeline registra seu profiler com rótulos (ex.: source=...); o
+    servidor roda numa thread daemon e só lê os profilers quando consultado.
+    """
+
+    def __init__(self, port=9108, host="127.0.0.1"):
+        self._sources = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def register(self, profiler, **labels):
+        with self._lock:
+            self._sources.append((labels, profiler))
+
+    def render(self):
+        with self._lock:
+            sources = list(self._sources)
+        return prometheus_text(sources)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,156 @@
+# region.py
+# Região de interesse (ROI) e linha virtual de contagem, configuráveis por fonte
+
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+def parse_points(text):
+    """Converte "x1,y1; x2,y2; ..." em uma lista de pontos [(x, y), ...]."""
+    points = []
+    for pair in text.replace("\n", ";").split(";"):
+        pair = pair.strip()
+        if not pair:
+            continue
+        x, y = (int(float(v)) for v in pair.split(","))
+        points.append((x, y))
+    return points
+
+
+def format_points(points):
+    return "; ".join(f"{x},{y}" for x, y in points)
+
+
+# ========== REGIÃO DE INTERESSE ==========
+class RegionOfInterest:
+    """Polígono onde os veículos interessam.
+
+    prepare() recorta o frame no retângulo envolvente do polígono e zera os
+    pixels de fora, então a inferência roda em menos pixels. As detecções
+    voltam às coordenadas do frame somando `offset`.
+    """
+
+    def __init__(self, polygon):
+        if len(polygon) < 3:
+            raise ValueError("A região de interesse precisa de pelo menos 3 pontos")
+        self.polygon = np.array(polygon, dtype=np.int32)
+        self._mask = None
+        self._buffers = {}
+
+    def _setup(self, frame_shape):
+        h, w = frame_shape[:2]
+        x, y, bw, bh = cv2.boundingRect(self.polygon)
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(w, x + bw), min(h, y + bh)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError("A região de interesse está fora do vídeo")
+        self.offset = (x1, y1)
+        self._bounds = (x1, y1, x2, y2)
+        self._mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+        cv2.fillPoly(self._mask, [self.polygon - [x1, y1]], 255)
+        self._buffers = {}
+
+    def prepare(self, frame, index=0):
+        """Recorte mascarado do frame; `index` escolhe o buffer (um por frame do lote)."""
+        if self._mask is None:
+            self._setup(frame.shape)
+        x1, y1, x2, y2 = self._bounds
+        crop = frame[y1:y2, x1:x2]
+        buffer = self._buffers.get(index)
+        if buffer is None or buffer.shape != crop.shape:
+            buffer = np.empty_like(crop)
+            self._buffers[index] = buffer
+        return cv2.bitwise_and(crop, crop, dst=buffer, mask=self._mask)
+
+    def draw(self, frame, scale=1.0):
+        polygon = self.polygon if scale == 1.0 else (self.polygon * scale).astype(np.int32)
+        cv2.polylines(frame, [polygon], True, (255, 217, 0), 2)
+
+
+# ========== LINHA DE CONTAGEM ==========
+class CountingLine:
+    """Segmento A-B; um track conta quando o centróide o atravessa.
+
+    Contar no cruzamento evita recontar um veículo cujo ID troca no meio da
+    cena: o ID novo só conta se cruzar a linha de novo.
+    """
+
+    def __init__(self, points, max_age=30):
+        if len(points) != 2:
+            raise ValueError("A linha de contagem precisa de exatamente 2 pontos")
+        self.a = np.array(points[0], dtype=np.float64)
+        self.b = np.array(points[1], dtype=np.float64)
+        self.max_age = max_age
+        # id: (último centróide fora da linha, lado dele, frame em que o track foi visto)
+        self._last = {}
+        self._frame = 0
+
+    @staticmethod
+    def _side(p, q, r):
+        return np.sign((q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0]))
+
+    def update(self, ids, centroids):
+        """Registra as posições atuais e retorna os IDs que cruzaram a linha neste frame.
+
+        Um centróide exatamente sobre a linha não muda o lado do track: o
+        cruzamento é contado quando ele aparece do outro lado.
+        """
+        self._frame += 1
+        crossed = []
+        for track_id, point in zip(ids, centroids):
+            side = self._side(self.a, self.b, point)
+            previous = self._last.get(track_id)
+            if side == 0:
+                anchor, anchor_side = previous[:2] if previous else (None, 0)
+                self._last[track_id] = (anchor, anchor_side, self._frame)
+                continue
+            self._last[track_id] = (point, side, self._frame)
+            if previous is None or previous[0] is None:
+                continue
+            anchor, anchor_side = previous[:2]
+            # Interseção de segmentos: extremos de cada um em lados opostos do outro
+            if (anchor_side * side < 0 and
+                    self._side(anchor, point, self.a) * self._side(anchor, point, self.b) <= 0):
+                crossed.append(track_id)
+
+        if self._frame % self.max_age == 0:
+            limit = self._frame - self.max_age
+            self._last = {k: v for k, v in self._last.items() if v[2] >= limit}
+        return crossed
+
+    def draw(self, frame, scale=1.0):
+        a = tuple(int(v * scale) for v in self.a)
+        b = tuple(int(v * scale) for v in self.b)
+        cv2.line(frame, a, b, (255, 0, 255), 3)
+
+
+# ========== CONFIGURAÇÃO POR FONTE ==========
+def regions_path():
+    # Ao lado do .exe ou do script, como o modelo
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent / "regions.json"
+    return Path(__file__).parent / "regions.json"
+
+
+def load_region_config(source):
+    """Retorna {'roi': [...], 'line': [...]} salvo para a fonte, ou {}."""
+    path = regions_path()
+    if not source or not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get(source, {})
+
+
+def save_region_config(source, roi=None, line=None):
+    path = regions_path()
+    configs = {}
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            configs = json.load(f)
+    configs[source] = {'roi': roi or [], 'line': line or []}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(configs, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,190 @@
+# store.py
+# Registro persistente dos veículos contados: cada primeira aparição vira uma
+# linha num SQLite (modo WAL), gravada em lotes por uma thread própria
+#
+# Consulta do fluxo por hora:
+#   python store.py events.db --since 2026-10-01 --source "https://www.youtube.com/..."
+
+import argparse
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    position REAL,
+    track_id INTEGER NOT NULL,
+    class TEXT,
+    x1 REAL,
+    y1 REAL,
+    x2 REAL,
+    y2 REAL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_class_ts ON events (class, ts);
+CREATE INDEX IF NOT EXISTS events_source_ts ON events (source, ts);
+"""
+
+INSERT = ("INSERT INTO events (ts, source, position, track_id, class, x1, y1, x2, y2) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def events_path():
+    # Ao lado do .exe ou do script, como o modelo e as regiões
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent / "events.db"
+    return Path(__file__).parent / "events.db"
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    # WAL: leitores (consultas, outra execução) não bloqueiam a gravação
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class EventStore:
+    """Fila de eventos em memória e uma thread que os grava em lotes.
+
+    Cada evento é a tupla (ts, origem, posição, track_id, classe, x1, y1,
+    x2, y2): `ts` é a hora (época Unix) em que o veículo foi contado e
+    `posição`, os segundos desde o início do vídeo. record() só enfileira,
+    então o laço de processamento nunca espera o disco. A thread grava
+    numa única transação a cada `batch_size` eventos ou `flush_interval`
+    segundos. close() grava o que faltar; vários processos podem gravar
+    no mesmo arquivo.
+    """
+
+    def __init__(self, path=None, batch_size=500, flush_interval=1.0):
+        self.path = Path(path) if path else events_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        # Cria o esquema aqui para um caminho inválido falhar na hora, não na thread
+        conn = connect(self.path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def record(self, events):
+        """Enfileira uma lista de eventos."""
+        if events:
+            self._queue.put(events)
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        pending = []
+        last_flush = time.monotonic()
+        closing = False
+        try:
+            while not closing:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = []
+                # Junta tudo que já estiver na fila antes de decidir gravar
+                while item is not None:
+                    pending.extend(item)
+                    if len(pending) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                closing = item is None
+
+                now = time.monotonic()
+                if pending and (closing or len(pending) >= self.batch_size
+                                or now - last_flush >= self.flush_interval):
+                    self._flush(conn, pending)
+                    pending = []
+                    last_flush = now
+        finally:
+            conn.close()
+
+    def _flush(self, conn, events):
+        try:
+            with conn:
+                conn.executemany(INSERT, events)
+            self.written += len(events)
+        except sqlite3.Error as e:
+            self.failed += len(events)
+            logger.error("Falha ao gravar %d eventos em %s: %s", len(events), self.path, e)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def hourly_counts(path=None, start=None, end=None, source=None):
+    """[('AAAA-MM-DD HH' no horário local, classe, veículos)] entre `start` e `end`.
+
+    Usa os índices por tempo; não precisa reprocessar vídeo nenhum. As horas
+    são as do relógio local, como --since/--until (fusos de meia hora inclusos).
+    """
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("ts >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("ts < ?")
+        params.append(end)
+    if source is not None:
+        conditions.append("source = ?")
+        params.append(source)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = connect(path or events_path())
+    try:
+        return conn.execute(
+            f"SELECT strftime('%Y-%m-%d %H', ts, 'unixepoch', 'localtime') AS hour, class, COUNT(*) "
+            f"FROM events {where} GROUP BY hour, class ORDER BY hour, class",
+            params
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _parse_date(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Veículos por hora e classe a partir do events.db.")
+    parser.add_argument("path", nargs="?", default=None,
+                        help="arquivo de eventos (padrão: events.db ao lado do programa)")
+    parser.add_argument("--since", default=None, help="início, ex.: 2026-10-01 ou 2026-10-01T08:00")
+    parser.add_argument("--until", default=None, help="fim (exclusivo), mesmo formato")
+    parser.add_argument("--source", default=None, help="apenas esta origem (arquivo ou link)")
+    args = parser.parse_args(argv)
+
+    path = Path(args.path) if args.path else events_path()
+    if not path.exists():
+        print(f"Erro: {path} não existe", file=sys.stderr)
+        return 1
+
+    rows = hourly_counts(path, _parse_date(args.since), _parse_date(args.until), args.source)
+    print("hora,classe,veiculos")
+    for hour, vehicle_class, count in rows:
+        print(f"{hour}:00,{vehicle_class or ''},{count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# stream.py
+# Leitura resiliente de streams ao vivo: detecta travamentos e quedas,
+# resolve a URL de novo e reconecta com espera exponencial
+
+import logging
+import threading
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo para abrir a conexão e para cada leitura, em ms (backend FFmpeg)
+OPEN_TIMEOUT_MS = 10000
+READ_TIMEOUT_MS = 5000
+
+
+def open_capture(url, open_timeout_ms=OPEN_TIMEOUT_MS, read_timeout_ms=READ_TIMEOUT_MS):
+    """VideoCapture com timeouts: uma leitura travada falha em vez de bloquear para sempre."""
+    params = []
+    # Versões antigas do OpenCV não têm essas propriedades
+    if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+        params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout_ms]
+    if hasattr(cv2, 'CAP_PROP_READ_TIMEOUT_MSEC'):
+        params += [cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout_ms]
+    if params:
+        return cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+    return cv2.VideoCapture(url)
+
+
+class ReconnectingCapture:
+    """Mesma interface usada do cv2.VideoCapture, mas sobrevive a quedas da rede.
+
+    `resolve(fresh)` devolve a URL do stream (fresh=True pede uma URL nova,
+    ignorando o cache). Quando grab() falha (fim inesperado ou leitura que
+    passou do timeout), a captura é descartada e reaberta com esperas de
+    1, 2, 4... até `max_backoff` segundos, no máximo `max_retries` vezes
+    seguidas (None = sem limite). Rastreador e contador não são tocados: o
+    pipeline continua de onde parou. cancel() interrompe uma espera em curso.
+
+    Vídeos comuns (não ao vivo) têm duração conhecida: chegar ao último
+    frame é o fim de verdade, e uma reconexão no meio volta à mesma posição
+    em vez de recomeçar (o que recontaria veículos).
+    """
+
+    def __init__(self, resolve, max_retries=None, max_backoff=30.0):
+        self.resolve = resolve
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self._cap = None
+        self._fps = 0.0
+        self._frame_count = 0
+        self._position = 0
+        self._cancelled = threading.Event()
+
+    def open(self):
+        """Primeira conexão: tenta a URL em cache e, se falhar, uma URL recém-resolvida."""
+        for fresh in (False, True):
+            url = self.resolve(fresh)
+            if url and self._connect(url):
+                return True
+        return False
+
+    def _connect(self, url):
+        cap = open_capture(url)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        if self._cap is not None:
+            self._cap.release()
+        self._cap = cap
+        self._fps = cap.get(cv2.CAP_PROP_FPS) or self._fps
+        # Lives (HLS) informam 0 ou -1 frames
+        self._frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        if self._frame_count and self._position:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self._position)
+        return True
+
+    def _reconnect(self):
+        attempt = 0
+        delay = min(1.0, self.max_backoff)
+        while not self._cancelled.is_set():
+            if self.max_retries is not None and attempt >= self.max_retries:
+                logger.error("Stream perdido após %d tentativas de reconexão", attempt)
+                return False
+            attempt += 1
+            logger.warning("Stream interrompido; reconectando em %.1f s (tentativa %d)",
+                           delay, attempt)
+            if self._cancelled.wait(delay):
+                return False
+            delay = min(delay * 2, self.max_backoff)
+            try:
+                url = self.resolve(True)
+            except Exception as e:
+                logger.warning("Falha ao resolver o stream: %s", e)
+                continue
+            if url and self._connect(url):
+                self.reconnects += 1
+                logger.info("Stream reconectado (%d reconexões até agora)", self.reconnects)
+                return True
+        return False
+
+    def isOpened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def get(self, prop):
+        # O FPS da primeira conexão vale durante as reconexões
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def set(self, prop, value):
+        # Stream ao vivo: sem seek
+        return False
+
+    def grab(self):
+        reconnected_at = None
+        while self._cap is not None:
+            if self._cap.grab():
+                self._position += 1
+                return True
+            if self._frame_count:
+                if self._position >= self._frame_count - 1:
+                    return False  # fim do vídeo
+                # Reconectou e falhou de novo no mesmo frame: a duração informada
+                # estava errada ou o final não decodifica; é o fim do vídeo
+                if reconnected_at == self._position:
+                    logger.info("Fim do vídeo no frame %d (duração informada: %d frames)",
+                                self._position, self._frame_count)
+                    return False
+            if not self._reconnect():
+                return False
+            reconnected_at = self._position
+        return False
+
+    def retrieve(self, image=None):
+        return self._cap.retrieve(image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def release(self):
+        self._cancelled.set()
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
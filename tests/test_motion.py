@@ -0,0 +1,44 @@
+# tests/test_motion.py
+# Filtro de movimento: pular a inferência em frames parados não pode mudar a
+# contagem, com nenhum dos rastreadores
+#
+# Uso: python -m pytest tests
+
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.bench_pipeline import ColorDetector, make_traffic_video
+from pipeline import VehiclePipeline
+
+
+@pytest.fixture(scope="module")
+def traffic(tmp_path_factory):
+    path = tmp_path_factory.mktemp("motion") / "traffic.avi"
+    truth = make_traffic_video(path, seconds=15, width=480, height=270, seed=1)
+    return path, truth
+
+
+def count(video, tracker, threshold):
+    pipeline = VehiclePipeline(video_path=str(video), model=ColorDetector(), tracker=tracker,
+                               motion_threshold=threshold)
+    counter = pipeline.run()
+    skipped = pipeline.motion_gate.skipped if pipeline.motion_gate else 0
+    return dict(counter.class_counts), skipped
+
+
+@pytest.mark.parametrize("tracker", ["euclidean", "bytetrack", "botsort"])
+def test_gate_does_not_change_counts(traffic, tracker, caplog):
+    if tracker != "euclidean":
+        pytest.importorskip("ultralytics")
+    caplog.set_level(logging.ERROR)
+    video, _ = traffic
+    baseline, _ = count(video, tracker, None)
+    for threshold in (0.002, 0.02):
+        counts, skipped = count(video, tracker, threshold)
+        assert counts == baseline, f"threshold={threshold}"
+        # O vídeo tem trechos sem veículo: o filtro precisa ter pulado algo
+        assert skipped > 0
@@ -0,0 +1,304 @@
+# tests/test_stream.py
+# ReconnectingCapture contra um servidor HTTP local que derruba a conexão ou
+# responde 503 no meio do vídeo: um arquivo (com Range, como o YouTube) e um
+# HLS ao vivo com janela deslizante
+#
+# Uso: python -m pytest tests
+
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from stream import ReconnectingCapture
+
+FPS = 10
+SIZE = (320, 240)
+# Nível de cinza do frame i: dá para conferir se a leitura retomou no frame certo.
+# O ruído deixa cada frame com dezenas de KB, como um vídeo de verdade, para a
+# queda acontecer no meio da reprodução e não na abertura
+LEVEL_BASE = 8
+LEVEL_STEP = 4
+NOISE = 6
+SEGMENT_SECONDS = 1.0
+PLAYLIST_WINDOW = 3
+SEGMENT_VARIANTS = 4
+# Arquivos saem em blocos, no ritmo de uma conexão real, para a queda pegar a
+# resposta ainda em andamento
+CHUNK_BYTES = 8192
+CHUNK_INTERVAL = 0.05
+
+
+def frame_level(image):
+    return int(round((float(image.mean()) - LEVEL_BASE) / LEVEL_STEP))
+
+
+def write_video(path, n_frames, fourcc='MJPG', first_level=0):
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), FPS, SIZE)
+    assert writer.isOpened()
+    for i in range(n_frames):
+        noise = rng.integers(-NOISE, NOISE + 1, (SIZE[1], SIZE[0], 3))
+        frame = LEVEL_BASE + (first_level + i) * LEVEL_STEP + noise
+        writer.write(frame.astype(np.uint8))
+    writer.release()
+    return Path(path).read_bytes()
+
+
+def read_levels(cap, limit=1000):
+    """Níveis de todos os frames até grab() falhar; para em `limit` se nunca acabar."""
+    levels = []
+    while len(levels) < limit and cap.grab():
+        ok, image = cap.retrieve()
+        assert ok
+        levels.append(frame_level(image))
+    return levels
+
+
+# ========== SERVIDOR ==========
+class MediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MediaHandler)
+        self.files = {}
+        self.paced = False       # envia os arquivos em blocos espaçados
+        self.unavailable = 0     # próximas requisições respondidas com 503
+        self.outage_until = 0.0  # até quando tudo responde 503
+        self.generation = 0      # muda a cada drop(): respostas em andamento são cortadas
+        self.live_start = time.monotonic()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def drop(self, failures=0):
+        """Derruba (RST) as respostas em andamento; as próximas `failures` recebem 503."""
+        with self.lock:
+            self.generation += 1
+            self.unavailable += failures
+
+    def live_playlist(self):
+        sequence = int((time.monotonic() - self.live_start) / SEGMENT_SECONDS)
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(SEGMENT_SECONDS)}",
+                 f"#EXT-X-MEDIA-SEQUENCE:{sequence}"]
+        for n in range(sequence, sequence + PLAYLIST_WINDOW):
+            lines += ["#EXT-X-DISCONTINUITY", f"#EXTINF:{SEGMENT_SECONDS:.1f},",
+                      f"/seg{n % SEGMENT_VARIANTS}.ts"]
+        return ("\n".join(lines) + "\n").encode()
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            unavailable = server.unavailable > 0 or time.monotonic() < server.outage_until
+            if server.unavailable > 0:
+                server.unavailable -= 1
+            generation = server.generation
+
+        if unavailable:
+            self.send_error(503)
+            return
+        if self.path == "/live.m3u8":
+            body = server.live_playlist()
+        elif self.path in server.files:
+            body = server.files[self.path]
+        else:
+            self.send_error(404)
+            return
+
+        start, end = 0, len(body) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        body = body[start:end + 1]
+        if not server.paced:
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), CHUNK_BYTES):
+            if server.generation != generation:
+                # SO_LINGER 0: o close manda RST, como uma queda de rede
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                                           struct.pack('ii', 1, 0))
+                self.close_connection = True
+                return
+            self.wfile.write(body[offset:offset + CHUNK_BYTES])
+            self.wfile.flush()
+            time.sleep(CHUNK_INTERVAL)
+
+
+@pytest.fixture
+def server():
+    server = MediaServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def open_stream(url, max_resolves=None, **kwargs):
+    """Captura com esperas curtas; depois de `max_resolves` a URL some (link expirado)."""
+    resolved = []
+
+    def resolve(fresh):
+        resolved.append(fresh)
+        if max_resolves is not None and len(resolved) > max_resolves:
+            return None
+        return url
+
+    cap = ReconnectingCapture(resolve, max_backoff=0.1, **kwargs)
+    assert cap.open()
+    return cap, resolved
+
+
+# ========== ARQUIVO ==========
+def test_file_resumes_at_same_frame_after_drop(server, tmp_path):
+    data = write_video(tmp_path / "video.avi", 60)
+    server.files["/video.avi"] = data
+    server.paced = True
+    cap, resolved = open_stream(server.url("/video.avi"))
+    try:
+        levels = read_levels(cap, limit=20)
+        # Queda no meio, com o servidor fora do ar nas duas requisições seguintes
+        server.drop(failures=2)
+        levels += read_levels(cap)
+        assert cap.reconnects == 1
+        # Cada tentativa resolve a URL de novo; ao menos uma recebeu 503
+        assert resolved[0] is False and resolved.count(True) >= 2
+        assert server.unavailable == 0
+        # Nenhum frame repetido nem pulado: não reconta veículos
+        assert levels == list(range(60))
+    finally:
+        cap.release()
+
+
+def test_file_ends_when_frame_count_is_overestimated(server, tmp_path):
+    # Arquivo cortado: o cabeçalho ainda diz 60 frames, mas só os primeiros decodificam
+    data = write_video(tmp_path / "video.avi", 60)
+    truncated = data[:int(len(data) * 0.8)]
+    (tmp_path / "truncated.avi").write_bytes(truncated)
+    local = cv2.VideoCapture(str(tmp_path / "truncated.avi"))
+    assert local.get(cv2.CAP_PROP_FRAME_COUNT) == 60
+    decodable = read_levels(local)
+    local.release()
+    assert len(decodable) < 59
+
+    server.files["/truncated.avi"] = truncated
+    # Limites só para o teste terminar se o fim nunca for reconhecido
+    cap, resolved = open_stream(server.url("/truncated.avi"), max_resolves=10, max_retries=2)
+    try:
+        levels = read_levels(cap)
+        # Uma reconexão no frame que falhou e, falhando de novo lá, fim do vídeo
+        assert levels == decodable
+        assert cap.reconnects == 1
+        assert len(resolved) == 2
+    finally:
+        cap.release()
+
+
+# ========== HLS AO VIVO ==========
+@pytest.fixture
+def live(server, tmp_path):
+    for n in range(SEGMENT_VARIANTS):
+        path = tmp_path / f"seg{n}.ts"
+        write_video(path, int(FPS * SEGMENT_SECONDS), fourcc='mpg2', first_level=n * 10)
+        server.files[f"/seg{n}.ts"] = path.read_bytes()
+    server.live_start = time.monotonic()
+    return server
+
+
+def test_live_playlist_resumes_after_outage(live):
+    cap, resolved = open_stream(live.url("/live.m3u8"))
+    try:
+        assert len(read_levels(cap, limit=15)) == 15
+        live.outage_until = time.monotonic() + 3.0
+        # Leitura continua depois que o servidor volta, com o mesmo objeto
+        after = []
+        deadline = time.monotonic() + 30.0
+        while len(after) < 20 and time.monotonic() < deadline:
+            if not cap.grab():
+                break
+            if time.monotonic() >= live.outage_until:
+                after.append(cap.retrieve()[1])
+        assert len(after) == 20
+        assert cap.reconnects >= 1
+        assert resolved.count(True) >= 1
+    finally:
+        cap.release()
+
+
+def test_live_gives_up_after_max_retries(live):
+    cap, _ = open_stream(live.url("/live.m3u8"), max_retries=2)
+    try:
+        assert len(read_levels(cap, limit=5)) == 5
+        live.outage_until = time.monotonic() + 60.0
+        start = time.monotonic()
+        read_levels(cap, limit=1000)
+        assert cap.reconnects == 0
+        assert time.monotonic() - start < 20.0
+    finally:
+        cap.release()
+
+
+def test_pipeline_stop_interrupts_reconnect_backoff(live):
+    from benchmarks.bench_pipeline import ColorDetector
+    from pipeline import VehiclePipeline
+
+    url = live.url("/live.m3u8")
+    resolved = []
+    frames = threading.Event()
+
+    def resolve(fresh=False):
+        resolved.append(fresh)
+        return url
+
+    pipeline = VehiclePipeline(youtube_url=url, model=ColorDetector(), tracker='euclidean',
+                               on_frame=lambda frame: frames.set())
+    pipeline._resolve_stream = resolve
+    runner = threading.Thread(target=pipeline.run, daemon=True)
+    runner.start()
+    try:
+        assert frames.wait(15.0)
+        # Queda longa: a produtora entra nas esperas de 1, 2, 4... s da reconexão
+        live.outage_until = time.monotonic() + 120.0
+        deadline = time.monotonic() + 30.0
+        while resolved.count(True) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert resolved.count(True) >= 2
+
+        start = time.monotonic()
+        pipeline.stop()
+        runner.join(5.0)
+        assert not runner.is_alive()
+        assert time.monotonic() - start < 5.0
+    finally:
+        pipeline.stop()
+        live.outage_until = 0.0
@@ -1,64 +1,345 @@
 # object_tracking/tracker.py
-import cv2
+import inspect
+import logging
+
 import numpy as np
-from ultralytics import YOLO
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+# Custo dos pares além de max_distance: a atribuição nunca os prefere a um par válido
+GATED_COST = 1e9
+
+# Multiplicador que transforma a célula (x, y) da grade numa chave inteira única
+_GRID_KEY_STRIDE = 1 << 32
+
+SPATIAL_INDEXES = (None, 'grid', 'kdtree')
+
+# Abaixo disso a força bruta vetorizada ganha da grade (benchmarks/bench_tracker.py)
+SPARSE_MIN_OBJECTS = 300
+
+logger = logging.getLogger(__name__)
+
 
 class EuclideanDistTracker:
-    def __init__(self, max_distance=50, disappear_threshold=10):
+    """Rastreador por distância entre centróides.
+
+    spatial_index=None compara todos os tracks com todas as detecções.
+    'grid' (células do tamanho de max_distance) ou 'kdtree' consideram só
+    os pares próximos, deixando o update quase linear em cenas densas.
+    """
+
+    def __init__(self, max_distance=50, disappear_threshold=10, spatial_index=None):
+        if spatial_index not in SPATIAL_INDEXES:
+            raise ValueError(f"spatial_index inválido: {spatial_index!r}")
         self.next_id = 0
-        self.tracks = {}  # id: {'centroid': (x, y), 'last_seen': frame_count}
+        # Estado dos tracks em arrays contíguos, alinhados pelo índice
+        self.ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, 2), dtype=np.int64)
+        self.last_seen = np.empty(0, dtype=np.int64)
         self.max_distance = max_distance
         self.disappear_threshold = disappear_threshold
+        self.spatial_index = spatial_index
+        # Id atribuído a cada detecção no último update, na ordem de entrada
+        self.detection_ids = np.empty(0, dtype=np.int64)
+
+    @property
+    def tracks(self):
+        # Visão compatível com o formato antigo: id: {'centroid': (x, y), 'last_seen': frame_count}
+        return {
+            int(track_id): {'centroid': (int(cx), int(cy)), 'last_seen': int(seen)}
+            for track_id, (cx, cy), seen in zip(self.ids, self.centroids, self.last_seen)
+        }
 
     def update(self, detections, frame_count):
-        centroids = []
-        for x1, y1, x2, y2 in detections:
-            cx = int((x1 + x2) / 2)
-            cy = int((y1 + y2) / 2)
-            centroids.append((cx, cy))
-
-        assigned = set()
-        used_tracks = set()
-
-        # Associar detecções aos tracks existentes (menor distância)
-        for track_id, track in list(self.tracks.items()):
-            min_dist = float('inf')
-            best_idx = -1
-            for i, (cx, cy) in enumerate(centroids):
-                if i in assigned:
-                    continue
-                dist = np.linalg.norm(np.array(track['centroid']) - np.array([cx, cy]))
-                if dist < min_dist and dist <= self.max_distance:
-                    min_dist = dist
-                    best_idx = i
-            if best_idx != -1:
-                assigned.add(best_idx)
-                used_tracks.add(track_id)
-                self.tracks[track_id] = {
-                    'centroid': centroids[best_idx],
-                    'last_seen': frame_count
-                }
+        boxes = np.asarray(detections, dtype=np.float64).reshape(-1, 4)
+        centroids = ((boxes[:, :2] + boxes[:, 2:]) / 2).astype(np.int64)
+
+        n_tracks = len(self.ids)
+        n_detections = len(centroids)
+        # Índice do track associado a cada detecção (-1 = nenhum)
+        assignment = np.full(n_detections, -1, dtype=np.int64)
+
+        if n_tracks and n_detections:
+            if self.spatial_index is None:
+                rows, cols = self._match_dense(centroids)
+            else:
+                rows, cols = self._match_sparse(*self._candidate_pairs(centroids))
+
+            self.centroids[rows] = centroids[cols]
+            self.last_seen[rows] = frame_count
+            assignment[cols] = rows
 
         # Criar novos tracks para detecções não associadas
-        for i, centroid in enumerate(centroids):
-            if i not in assigned:
-                self.tracks[self.next_id] = {
-                    'centroid': centroid,
-                    'last_seen': frame_count
-                }
-                self.next_id += 1
+        unmatched = assignment < 0
+        n_new = int(unmatched.sum())
+        if n_new:
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n_new)])
+            self.centroids = np.concatenate([self.centroids, centroids[unmatched]])
+            self.last_seen = np.concatenate([self.last_seen, np.full(n_new, frame_count)])
+            self.next_id += n_new
+            assignment[unmatched] = np.arange(n_tracks, n_tracks + n_new)
+        self.detection_ids = self.ids[assignment]
 
         # Remover tracks antigos
-        for track_id in list(self.tracks.keys()):
-            if frame_count - self.tracks[track_id]['last_seen'] > self.disappear_threshold:
-                del self.tracks[track_id]
+        alive = frame_count - self.last_seen <= self.disappear_threshold
+        if not alive.all():
+            self.ids = self.ids[alive]
+            self.centroids = self.centroids[alive]
+            self.last_seen = self.last_seen[alive]
 
         # Retornar [(cx, cy, id), ...]
-        output = []
-        for track_id, track in self.tracks.items():
-            cx, cy = track['centroid']
-            output.append((cx, cy, track_id))
-        return output
+        return list(zip(self.centroids[:, 0].tolist(), self.centroids[:, 1].tolist(),
+                        self.ids.tolist()))
+
+    def _match_dense(self, centroids):
+        # Associação ótima (Hungarian) sobre a matriz completa de distâncias
+        diff = self.centroids[:, None, :] - centroids[None, :, :]
+        dist = np.hypot(diff[..., 0], diff[..., 1])
+        cost = np.where(dist <= self.max_distance, dist, GATED_COST)
+        rows, cols = linear_sum_assignment(cost)
+        valid = dist[rows, cols] <= self.max_distance
+        return rows[valid], cols[valid]
+
+    def _candidate_pairs(self, centroids):
+        """Pares (track, detecção, distância) dentro de max_distance, via índice espacial."""
+        if self.spatial_index == 'kdtree':
+            pairs = cKDTree(self.centroids).sparse_distance_matrix(
+                cKDTree(centroids), self.max_distance, output_type='ndarray')
+            return pairs['i'], pairs['j'], pairs['v']
+
+        # Grade uniforme: pares dentro de max_distance ficam em células vizinhas (3x3)
+        cell = max(self.max_distance, 1)
+        track_cells = np.floor_divide(self.centroids, cell)
+        det_cells = np.floor_divide(centroids, cell)
+        track_keys = track_cells[:, 0] * _GRID_KEY_STRIDE + track_cells[:, 1]
+        order = np.argsort(track_keys, kind='stable')
+        sorted_keys = track_keys[order]
+
+        rows, cols = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                keys = (det_cells[:, 0] + dx) * _GRID_KEY_STRIDE + det_cells[:, 1] + dy
+                lo = np.searchsorted(sorted_keys, keys, side='left')
+                hi = np.searchsorted(sorted_keys, keys, side='right')
+                counts = hi - lo
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                # Expande cada intervalo [lo, hi) em índices individuais
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                rows.append(order[np.repeat(lo, counts) + offsets])
+                cols.append(np.repeat(np.arange(len(centroids)), counts))
+
+        if not rows:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        diff = self.centroids[rows] - centroids[cols]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        near = dist <= self.max_distance
+        return rows[near], cols[near], dist[near]
+
+    def _match_sparse(self, rows, cols, dist):
+        """Hungarian separado por componente conexa do grafo de pares candidatos."""
+        if len(rows) == 0:
+            return rows, cols
+
+        n_tracks = len(self.ids)
+        size = n_tracks + int(cols.max()) + 1
+        graph = coo_matrix((np.ones(len(rows)), (rows, cols + n_tracks)), shape=(size, size))
+        _, labels = connected_components(graph, directed=False)
+        component = labels[rows]
+
+        order = np.argsort(component, kind='stable')
+        rows, cols, dist, component = rows[order], cols[order], dist[order], component[order]
+        bounds = np.flatnonzero(np.diff(component)) + 1
+
+        matched_rows, matched_cols = [], []
+        for r, c, d in zip(np.split(rows, bounds), np.split(cols, bounds), np.split(dist, bounds)):
+            if len(r) == 1:
+                matched_rows.append(r)
+                matched_cols.append(c)
+                continue
+            track_idx, r_local = np.unique(r, return_inverse=True)
+            det_idx, c_local = np.unique(c, return_inverse=True)
+            cost = np.full((len(track_idx), len(det_idx)), GATED_COST)
+            cost[r_local, c_local] = d
+            a, b = linear_sum_assignment(cost)
+            valid = cost[a, b] < GATED_COST
+            matched_rows.append(track_idx[a[valid]])
+            matched_cols.append(det_idx[b[valid]])
+
+        return np.concatenate(matched_rows), np.concatenate(matched_cols)
 
     def get_active_count(self):
-        return len(self.tracks)
\ No newline at end of file
+        return len(self.ids)
+
+
+# ========== BACKENDS DE RASTREAMENTO ==========
+# Todos recebem as detecções de detect() e retornam (xyxy, ids, classes)
+# como arrays NumPy, ou None quando nenhum objeto está sendo rastreado.
+
+class TrackerBackend:
+    """Base dos backends: detecção com model.predict, rastreamento em update()."""
+
+    conf = 0.25
+    # True quando o estado do rastreamento fica dentro do modelo (não dá para
+    # dividir um mesmo modelo entre várias fontes)
+    tracks_in_model = False
+
+    def detect(self, model, images, **kwargs):
+        return model.predict(images, **kwargs)
+
+    def update(self, result, frame):
+        raise NotImplementedError
+
+
+class UltralyticsTracker(TrackerBackend):
+    """BoT-SORT/ByteTrack do ultralytics, o mesmo que model.track() usa internamente."""
+
+    # Confiança mínima que model.track() usa por padrão
+    conf = 0.1
+
+    def __init__(self, tracker_cfg="botsort.yaml", frame_rate=30):
+        import yaml
+        from ultralytics.trackers.track import TRACKER_MAP
+        from ultralytics.utils import IterableSimpleNamespace
+        from ultralytics.utils.checks import check_yaml
+
+        with open(check_yaml(tracker_cfg), encoding="utf-8") as f:
+            cfg = IterableSimpleNamespace(**yaml.safe_load(f))
+        tracker_class = TRACKER_MAP[cfg.tracker_type]
+        # frame_rate saiu do construtor nas versões 8.4.x mais novas
+        kwargs = {}
+        if 'frame_rate' in inspect.signature(tracker_class).parameters:
+            kwargs['frame_rate'] = frame_rate
+        self.tracker = tracker_class(args=cfg, **kwargs)
+        self._ids = {}  # (ID do ultralytics, frame de início): ID do pipeline
+        self._next_id = 1
+
+    def update(self, result, frame):
+        # Colunas: x1, y1, x2, y2, id, score, cls, idx
+        tracked = self.tracker.update(result.boxes.cpu().numpy(), frame)
+        if len(tracked) == 0:
+            return None
+        ids, known = self._pipeline_ids(tracked)
+        if not known.all():
+            # IDs crus podem repetir os de veículos já contados: melhor perder as linhas
+            logger.warning("%d de %d tracks sem correspondência no rastreador; ignorados neste frame",
+                           int((~known).sum()), len(tracked))
+            tracked, ids = tracked[known], ids[known]
+            if len(tracked) == 0:
+                return None
+        return tracked[:, :4], ids, tracked[:, 6]
+
+    def _pipeline_ids(self, tracked):
+        """Troca os IDs do ultralytics por IDs numerados por este objeto.
+
+        Conforme a versão, o contador do ultralytics é global e zerado a cada
+        rastreador criado; ao retomar um checkpoint, um track novo receberia o
+        ID de um veículo já contado. O par (ID, frame de início) identifica o
+        track sem ambiguidade, e o mapa vai junto no pickle do checkpoint.
+        Cada linha é ligada ao seu track pelo ID cru, sem depender da ordem;
+        retorna os IDs e a máscara das linhas cujo track foi encontrado.
+        """
+        active = {t.track_id: t for t in self.tracker.tracked_stracks if t.is_activated}
+        ids = np.zeros(len(tracked), dtype=np.int64)
+        known = np.zeros(len(tracked), dtype=bool)
+        for row, raw_id in enumerate(tracked[:, 4].astype(np.int64)):
+            track = active.get(int(raw_id))
+            if track is None:
+                continue
+            key = (track.track_id, track.start_frame)
+            track_id = self._ids.get(key)
+            if track_id is None:
+                track_id = self._ids[key] = self._next_id
+                self._next_id += 1
+            ids[row] = track_id
+            known[row] = True
+
+        # Esquece os tracks que o ultralytics já descartou
+        if len(self._ids) > 2 * len(active) + 64:
+            alive = {(t.track_id, t.start_frame)
+                     for t in self.tracker.tracked_stracks + self.tracker.lost_stracks}
+            self._ids = {k: v for k, v in self._ids.items() if k in alive}
+        return ids, known
+
+
+class ModelTrackFallback(TrackerBackend):
+    """model.track() com persist, para quando a API interna do ultralytics não bate.
+
+    Mesmo resultado do UltralyticsTracker, mas o rastreador vive dentro do
+    modelo: não serve para várias fontes e não entra no checkpoint.
+    """
+
+    conf = 0.1
+    tracks_in_model = True
+
+    def __init__(self, tracker_cfg="botsort.yaml"):
+        self.tracker_cfg = tracker_cfg
+        # Sem persist na primeira chamada: o modelo em cache traria os tracks da execução anterior
+        self._persist = False
+
+    def __getstate__(self):
+        raise TypeError("o rastreamento de model.track() não pode ser salvo")
+
+    def detect(self, model, images, **kwargs):
+        results = model.track(images, tracker=self.tracker_cfg, persist=self._persist, **kwargs)
+        self._persist = True
+        return results
+
+    def update(self, result, frame):
+        boxes = result.boxes
+        if boxes is None or boxes.id is None:
+            return None
+        return boxes.xyxy.cpu().numpy(), boxes.id.cpu().numpy(), boxes.cls.cpu().numpy()
+
+
+def _ultralytics_backend(tracker_cfg):
+    try:
+        return UltralyticsTracker(tracker_cfg)
+    except Exception as e:
+        logger.warning("Rastreador %s não pôde ser criado direto (%s); usando model.track()",
+                       tracker_cfg, e)
+        return ModelTrackFallback(tracker_cfg)
+
+
+class EuclideanTrackerBackend(TrackerBackend):
+    """EuclideanDistTracker sobre as caixas detectadas: bem mais barato, menos robusto."""
+
+    # Sem o filtro de Kalman, detecções fracas viram tracks espúrios
+    conf = 0.25
+
+    def __init__(self, sparse_index='grid', **kwargs):
+        self.tracker = EuclideanDistTracker(**kwargs)
+        # Índice espacial só quando a cena tem objetos suficientes para compensar
+        self.sparse_index = sparse_index
+        self.frame_count = 0
+
+    def update(self, result, frame):
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        classes = boxes.cls.cpu().numpy()
+        crowded = max(len(xyxy), self.tracker.get_active_count()) >= SPARSE_MIN_OBJECTS
+        self.tracker.spatial_index = self.sparse_index if crowded else None
+        self.tracker.update(xyxy, self.frame_count)
+        self.frame_count += 1
+        if len(xyxy) == 0:
+            return None
+        return xyxy, self.tracker.detection_ids, classes
+
+
+TRACKER_BACKENDS = {
+    'botsort': lambda: _ultralytics_backend("botsort.yaml"),
+    'bytetrack': lambda: _ultralytics_backend("bytetrack.yaml"),
+    'euclidean': EuclideanTrackerBackend,
+}
+
+
+def create_tracker(name='botsort'):
+    if name not in TRACKER_BACKENDS:
+        raise ValueError(f"Rastreador desconhecido: {name}")
+    return TRACKER_BACKENDS[name]()